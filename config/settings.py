@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.0/ref/settings/
 """
 
 import os
+import tempfile
 from environs import Env
 
 env = ENV = Env()
@@ -153,3 +154,40 @@ LOGIN_URL = 'registration:login'
 LOGIN_REDIRECT_URL = 'registration:login_redirect'
 LOGOUT_REDIRECT_URL = '/'
 MAXIMUM_GROUPS_UNDER_TEACHER = 5
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Rendered result report PDFs, shared by every web worker on the host
+    'reports': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': env.str(
+            'REPORT_CACHE_DIR',
+            os.path.join(tempfile.gettempdir(), 'thesis-review-reports'),
+        ),
+        'TIMEOUT': env.int('REPORT_CACHE_TIMEOUT', 7 * 24 * 60 * 60),
+    },
+}
+
+# Reports with more results than this are rendered by
+# `manage.py process_report_jobs` instead of in the request
+REPORT_SYNC_MAX_RESULTS = env.int('REPORT_SYNC_MAX_RESULTS', 200)
+
+# Rows inserted per bulk query by the student CSV import
+STUDENT_IMPORT_CHUNK_SIZE = env.int('STUDENT_IMPORT_CHUNK_SIZE', 500)
+# Processes hashing imported students' passwords in
+# `manage.py process_import_jobs`, one per core when unset
+STUDENT_IMPORT_HASH_WORKERS = env.int('STUDENT_IMPORT_HASH_WORKERS', None)
+# Uploaded CSV files with more rows than this are imported by
+# `manage.py process_import_jobs` instead of in the request. Hashing each
+# student's password takes about 0.1s of CPU.
+STUDENT_IMPORT_SYNC_MAX_ROWS = env.int('STUDENT_IMPORT_SYNC_MAX_ROWS', 20)
+# Uploaded import files, kept out of MEDIA_ROOT so they are never served
+IMPORT_FILES_ROOT = env.str(
+    'IMPORT_FILES_ROOT', os.path.join(BASE_DIR, 'imports'))
+
+# Queue notifications in the outbox table, delivered by
+# `manage.py process_notification_outbox`, instead of creating them once the
+# transaction commits
+NOTIFICATIONS_USE_OUTBOX = env.bool('NOTIFICATIONS_USE_OUTBOX', False)
@@ -1,15 +1,19 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import Group
+from django.db.models import F
 from django.utils.translation import gettext_lazy as _
 
-from .filters import ResultReadinessFilter
+from .filters import GradeFilter, ResultReadinessFilter
 from .forms import (
     UserCreationFormExtended,
     AdminTeacherChangeForm,
     AdminTeacherCreateForm,
 )
-from .models import User, Student, Teacher, Admin, Result, Mark, WebsiteSettings
+from .models import (
+    User, Student, Teacher, Admin, Result, Mark, ImportJob, ImportJobError,
+    ReportJob, WebsiteSettings)
+from ..thesis.models import Batch
 
 
 class CustomUserAdmin(UserAdmin):
@@ -73,20 +77,55 @@ class MarkInlineResult(MarkInline):
 
 
 class ResultAdmin(admin.ModelAdmin):
-    list_display = ['student', 'total_marks', 'grade', ]
+    list_display = ['student', 'total_marks', 'grade', 'rank', 'percentile', ]
     search_fields = ['student__username', 'student']
     change_list_template = 'admin/result_change_list.html'
     list_filter = [
         ResultReadinessFilter,
+        GradeFilter,
         'student__department',
         'student__studentgroup__batch',
     ]
     inlines = [MarkInlineResult]
+    actions = ['recompute_total_marks']
 
     def get_queryset(self, request):
         return Result.objects.exclude(
             student__studentgroup=None,
-        ).order_by('student__username')
+        ).with_grade().select_related('student', 'ranking').order_by(
+            'student__username')
+
+    def grade(self, obj):
+        return obj.grade
+    grade.admin_order_field = 'total_marks'
+
+    def rank(self, obj):
+        ranking = getattr(obj, 'ranking', None)
+        return ranking and ranking.rank
+    rank.admin_order_field = 'ranking__rank'
+
+    def percentile(self, obj):
+        ranking = getattr(obj, 'ranking', None)
+        return ranking and ranking.percentile
+    percentile.admin_order_field = 'ranking__percentile'
+
+    def changelist_view(self, request, extra_context=None):
+        stale_batches = Batch.objects.filter(results_version__gt=0).exclude(
+            rankings_version=F('results_version'),
+        ).order_by('number')
+        if stale_batches:
+            self.message_user(
+                request,
+                'Ranks of {} are out of date until '
+                '`manage.py rebuild_rankings --stale` runs.'.format(
+                    ', '.join(str(batch) for batch in stale_batches)),
+                messages.WARNING,
+            )
+        response = super().changelist_view(request, extra_context)
+        if hasattr(response, 'context_data') and 'cl' in response.context_data:
+            response.context_data['grade_distribution'] = \
+                response.context_data['cl'].queryset.grade_distribution()
+        return response
 
     def has_add_permission(self, request) -> bool:
         return False
@@ -94,6 +133,13 @@ class ResultAdmin(admin.ModelAdmin):
     # def has_delete_permission(self, request, obj=None) -> bool:
     #     return False
 
+    def recompute_total_marks(self, request, queryset):
+        results = queryset.recompute_total_marks()
+        self.message_user(
+            request, f'Updated the total marks of {len(results)} results.')
+    recompute_total_marks.short_description = _(
+        'Recompute total marks of selected results')
+
 
 class StudentAdmin(UserAdmin):
     list_display = ('username', 'full_name', 'email', 'phone_number', 'cgpa',)
@@ -272,6 +318,64 @@ class WebsiteSettingsAdmin(admin.ModelAdmin):
         return False
 
 
+class ReportJobAdmin(admin.ModelAdmin):
+    list_display = (
+        'department', 'batch', 'status', 'requested_by', 'created_at',
+        'finished_at',)
+    list_filter = ('status', 'department', 'batch',)
+    readonly_fields = ('results_version', 'error', 'started_at', 'finished_at',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer('pdf')
+
+    def has_add_permission(self, request) -> bool:
+        return False
+
+
+class ImportJobErrorInline(admin.TabularInline):
+    model = ImportJobError
+    fields = ['row_number', 'username', 'message']
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None) -> bool:
+        return False
+
+
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = (
+        '__str__', 'status', 'progress', 'rows_per_second', 'created_count',
+        'errors_count', 'requested_by', 'created_at',)
+    list_filter = ('status',)
+    readonly_fields = (
+        'file', 'status', 'requested_by', 'rows_count', 'checkpoint',
+        'progress', 'rows_per_second', 'created_count', 'errors_count',
+        'error', 'started_at', 'updated_at', 'finished_at',)
+    inlines = [ImportJobErrorInline]
+    actions = ['resume']
+
+    def has_add_permission(self, request) -> bool:
+        return False
+
+    def progress(self, obj):
+        if obj.progress is None:
+            return '-'
+        return f'{obj.checkpoint} / {obj.rows_count} ({obj.progress:.0f}%)'
+
+    def rows_per_second(self, obj):
+        if obj.rows_per_second is None:
+            return '-'
+        return f'{obj.rows_per_second:.1f}'
+    rows_per_second.short_description = _('rows/s')
+
+    def resume(self, request, queryset):
+        count = queryset.filter(status=ImportJob.Status.FAILED).update(
+            status=ImportJob.Status.PENDING, error='')
+        self.message_user(request, f'Queued {count} failed imports again.')
+    resume.short_description = _('Resume selected failed imports')
+
+
 admin.site.unregister(Group)
 admin.site.register(User, CustomUserAdmin)
 admin.site.register(Admin, AdminAdmin)
@@ -279,3 +383,5 @@ admin.site.register(Student, StudentAdmin)
 admin.site.register(Teacher, TeacherAdmin)
 admin.site.register(Result, ResultAdmin)
 admin.site.register(WebsiteSettings, WebsiteSettingsAdmin)
+admin.site.register(ReportJob, ReportJobAdmin)
+admin.site.register(ImportJob, ImportJobAdmin)
@@ -1,7 +1,8 @@
 from django.contrib import admin
-from django.db.models import Count
 from django.utils.translation import gettext_lazy as _
 
+from .models import GRADE_TABLE, Result, get_grade_filter
+
 
 class ResultReadinessFilter(admin.SimpleListFilter):
     _READY = 'READY'
@@ -17,10 +18,23 @@ class ResultReadinessFilter(admin.SimpleListFilter):
         )
 
     def queryset(self, request, queryset):
-        annotated_queryset = queryset.annotate(marks_count=Count('marks'))
         options = {}
         if self.value() == self._READY:
-            options.update({'marks_count': 3})
+            options.update({'marks_count': Result.REQUIRED_MARKS_COUNT})
         elif self.value() == self._UNREADY:
-            options.update({'marks_count__lt': 3})
-        return annotated_queryset.filter(**options)
+            options.update({'marks_count__lt': Result.REQUIRED_MARKS_COUNT})
+        return queryset.filter(**options)
+
+
+class GradeFilter(admin.SimpleListFilter):
+    title = _('Grade')
+
+    parameter_name = 'grade'
+
+    def lookups(self, request, model_admin):
+        return [(grade, grade) for lower_bound, grade in GRADE_TABLE]
+
+    def queryset(self, request, queryset):
+        if self.value() in dict(self.lookups(request, None)):
+            return queryset.filter(get_grade_filter(self.value()))
+        return queryset
@@ -3,9 +3,7 @@ from django.utils.translation import gettext_lazy as _
 from django.contrib.auth.forms import UserCreationForm, UserChangeForm
 from django.core.exceptions import ValidationError
 
-import re
-
-from .models import User
+from .models import STUDENT_ID_REGEX, User
 from ..thesis.models import ResearchField
 
 
@@ -59,9 +57,8 @@ class StudentSignUpForm(UserCreationForm):
         )
 
     def clean_username(self):
-        regex = re.compile(r'\w+[0-9]{6}')
         username = self.cleaned_data.get("username").upper()
-        m = regex.match(username)
+        m = STUDENT_ID_REGEX.match(username)
         if not m:
             raise ValidationError('Invalid ID')
         return username
@@ -124,3 +121,8 @@ class TeacherUpdateForm(forms.ModelForm):
 
 class CSVUploadForm(forms.Form):
     csv_file = forms.FileField()
+    dry_run = forms.BooleanField(
+        label=_('Validate only'),
+        help_text=_('Check every row of the file without importing it.'),
+        required=False,
+    )
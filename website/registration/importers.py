@@ -0,0 +1,247 @@
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+import csv
+import itertools
+import operator
+import time
+from io import StringIO
+
+from .models import STUDENT_ID_REGEX, Result, User
+from .passwords import PasswordHasherPool
+
+STUDENT_CSV_FIELDS = ['full_name', 'email', 'phone_number', 'department']
+REQUIRED_CSV_COLUMNS = ['id', 'full_name', 'department']
+
+
+class ImportReport:
+    def __init__(self):
+        self.created = []
+        # (row number, username, message)
+        self.errors = []
+        # (row count, created count, seconds)
+        self.chunks = []
+
+    def merge(self, report):
+        self.created += report.created
+        self.errors += report.errors
+        self.chunks += report.chunks
+
+    @property
+    def rows_count(self):
+        return sum(rows_count for rows_count, _, _ in self.chunks)
+
+    @property
+    def elapsed(self):
+        return sum(elapsed for _, _, elapsed in self.chunks)
+
+    def add_error(self, row_number, username, error):
+        if isinstance(error, ValidationError):
+            error = ' '.join(
+                f'{field}: {" ".join(messages)}'
+                for field, messages in error.message_dict.items()
+            )
+        self.errors.append((row_number, username, str(error)))
+
+
+class StudentImporter:
+    """
+    Creates students from CSV rows in chunks: one query finds the existing
+    usernames of a chunk, one finds the groups listing its students, their
+    passwords are hashed, in a process pool when `hash_workers` is more
+    than one, and the users and their results are inserted with
+    `bulk_create`. Bulk inserts skip the `User` signals, the importer does
+    their work per chunk.
+    """
+
+    def __init__(self, chunk_size=500, hash_workers=1):
+        self.chunk_size = chunk_size
+        self.hash_workers = hash_workers
+
+    def import_file(self, file, start=0, on_chunk=None):
+        """
+        Imports the rows of `file` after the first `start` ones. Every chunk
+        is committed in its own transaction, together with the writes of
+        `on_chunk`, which receives the report of the chunk.
+        """
+        report = ImportReport()
+        rows = itertools.islice(
+            enumerate(csv.DictReader(file, delimiter=','), start=2),
+            start,
+            None,
+        )
+        first_rows = {}
+        with PasswordHasherPool(self.hash_workers) as self.hasher:
+            while True:
+                chunk = list(itertools.islice(rows, self.chunk_size))
+                if not chunk:
+                    break
+                chunk_report = ImportReport()
+                started = time.monotonic()
+                with transaction.atomic():
+                    created = self.import_chunk(
+                        chunk, first_rows, chunk_report)
+                    chunk_report.chunks.append(
+                        (len(chunk), created, time.monotonic() - started))
+                    if on_chunk is not None:
+                        on_chunk(chunk_report)
+                report.merge(chunk_report)
+        return report
+
+    def validate_file(self, file):
+        """
+        Checks every row of `file` without writing anything and reports all
+        the errors an import would hit, plus ids rejected on sign up.
+        Existing users are looked up once per chunk of ids.
+        """
+        report = ImportReport()
+        started = time.monotonic()
+        reader = csv.DictReader(file, delimiter=',')
+        missing_columns = [
+            column for column in REQUIRED_CSV_COLUMNS
+            if column not in (reader.fieldnames or [])
+        ]
+        if missing_columns:
+            report.add_error(
+                1, '', f'Missing columns: {", ".join(missing_columns)}.')
+            report.chunks.append((0, 0, time.monotonic() - started))
+            return report
+
+        rows_count = 0
+        first_rows = {}
+        for row_number, row in enumerate(reader, start=2):
+            rows_count += 1
+            self.validate_row(row_number, row, first_rows, report)
+
+        usernames = list(first_rows)
+        for index in range(0, len(usernames), self.chunk_size):
+            for username in User.objects.filter(
+                    username__in=usernames[index:index + self.chunk_size],
+            ).order_by().values_list('username', flat=True):
+                report.add_error(
+                    first_rows[username], username, 'User already exists.')
+
+        report.errors.sort(key=operator.itemgetter(0))
+        report.chunks.append((rows_count, 0, time.monotonic() - started))
+        return report
+
+    def validate_row(self, row_number, row, first_rows, report):
+        """
+        Reports the errors of one row and returns the unsaved student it
+        describes, or None when it is invalid. `first_rows` maps the ids
+        seen so far to the number of their row.
+        """
+        username = (row.get('id') or '').strip()
+        if not username:
+            report.add_error(row_number, username, 'Missing id.')
+            return None
+        if username in first_rows:
+            report.add_error(
+                row_number,
+                username,
+                f'Duplicate of row {first_rows[username]}.',
+            )
+            return None
+        first_rows[username] = row_number
+        errors_count = len(report.errors)
+        if not STUDENT_ID_REGEX.match(username.upper()):
+            report.add_error(row_number, username, 'Invalid ID.')
+        student = self.build_student(row, username)
+        try:
+            student.clean_fields(exclude=['password'])
+        except ValidationError as error:
+            report.add_error(row_number, username, error)
+        if len(report.errors) > errors_count:
+            return None
+        return student
+
+    def import_chunk(self, chunk, first_rows, report):
+        usernames = {(row.get('id') or '').strip() for _, row in chunk}
+        existing_usernames = set(User.objects.filter(
+            username__in=usernames,
+        ).values_list('username', flat=True))
+        studentgroups = get_listed_studentgroups(usernames)
+
+        students = []
+        for row_number, row in chunk:
+            student = self.validate_row(row_number, row, first_rows, report)
+            if student is None:
+                continue
+            if student.username in existing_usernames:
+                report.add_error(
+                    row_number, student.username, 'User already exists.')
+                continue
+            student.studentgroup = studentgroups.get(student.username)
+            students.append((row_number, student))
+
+        # New students log in with their email address as the password.
+        passwords = self.hasher.hash(
+            [student.email for _, student in students])
+        for (_, student), password in zip(students, passwords):
+            student.password = password
+
+        try:
+            with transaction.atomic():
+                self.create_students([student for _, student in students])
+        except Exception as error:
+            for row_number, student in students:
+                report.add_error(row_number, student.username, error)
+            return 0
+        report.created += [student.username for _, student in students]
+        return len(students)
+
+    def build_student(self, row, username):
+        return User(
+            username=username,
+            cgpa=(row.get('cgpa') or '').strip() or None,
+            is_student=True,
+            **{
+                field_name: (row.get(field_name) or '').strip()
+                for field_name in STUDENT_CSV_FIELDS
+            },
+        )
+
+    def create_students(self, students):
+        User.objects.bulk_create(students)
+        # Primary keys are not returned by bulk inserts on every backend.
+        student_ids = User.objects.filter(
+            username__in=[student.username for student in students],
+        ).values_list('id', flat=True)
+        Result.objects.bulk_create([
+            Result(student_id=student_id) for student_id in student_ids
+        ])
+
+
+def count_csv_rows(file, limit=None):
+    """
+    Counts the data rows of `file`, stopping after `limit` ones, and rewinds
+    it.
+    """
+    rows_count = sum(1 for _ in itertools.islice(csv.DictReader(file), limit))
+    file.seek(0)
+    return rows_count
+
+
+def read_uploaded_csv(uploaded_file):
+    """
+    Decodes an uploaded CSV file, dropping the byte order mark Excel writes
+    before the header.
+    """
+    return StringIO(uploaded_file.read().decode('utf-8-sig'))
+
+
+def get_listed_studentgroups(usernames):
+    """
+    Maps the usernames to the group whose student list names them.
+    """
+    from website.thesis.models import RosterEntry
+
+    usernames = [username for username in usernames if username]
+    if not usernames:
+        return {}
+    studentgroups = {}
+    for entry in RosterEntry.objects.filter(
+            username__in=usernames,
+    ).select_related('studentgroup').order_by('studentgroup_id'):
+        studentgroups.setdefault(entry.username, entry.studentgroup)
+    return studentgroups
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+import os
+import time
+
+from ...passwords import PasswordHasherPool
+
+
+class Command(BaseCommand):
+    help = (
+        'Print how many imported student passwords per second are hashed '
+        'with different numbers of worker processes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=200,
+            help='Number of passwords hashed per run.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            nargs='+',
+            default=sorted({1, 2, os.cpu_count() or 1}),
+            help='Worker counts to compare, 1, 2 and the number of cores by default.',
+        )
+
+    def handle(self, *args, rows, workers, **options):
+        passwords = [f'student{index}@example.com' for index in range(rows)]
+        baseline = None
+        for workers_count in workers:
+            with PasswordHasherPool(workers_count) as hasher:
+                # Start the worker processes before timing.
+                hasher.hash(passwords[:workers_count])
+                started = time.monotonic()
+                hasher.hash(passwords)
+                elapsed = time.monotonic() - started
+            rows_per_second = rows / elapsed
+            baseline = baseline or rows_per_second
+            self.stdout.write(
+                f'{workers_count} workers: {rows_per_second:.1f} rows/s '
+                f'({rows_per_second / baseline:.2f}x)'
+            )
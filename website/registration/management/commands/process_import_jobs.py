@@ -0,0 +1,128 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+import io
+import time
+from datetime import timedelta
+
+from ...importers import StudentImporter, count_csv_rows
+from ...models import ImportJob, ImportJobError
+
+
+class Command(BaseCommand):
+    help = (
+        'Import queued student CSV files in committed chunks, resuming '
+        'interrupted imports from their last checkpoint.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=settings.STUDENT_IMPORT_CHUNK_SIZE,
+            help='Number of rows committed per transaction.',
+        )
+        parser.add_argument(
+            '--hash-workers',
+            type=int,
+            default=settings.STUDENT_IMPORT_HASH_WORKERS,
+            help='Processes hashing passwords, one per core by default.',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=5,
+            help='Seconds to wait when no import is queued.',
+        )
+        parser.add_argument(
+            '--stale-after',
+            type=float,
+            default=10 * 60,
+            help='Seconds without progress after which a running import is resumed.',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once the queue is drained instead of polling.',
+        )
+
+    def handle(self, *args, chunk_size, hash_workers, sleep, stale_after,
+               once, **options):
+        self.importer = StudentImporter(chunk_size, hash_workers)
+        while True:
+            job = self.claim_job(stale_after)
+            if job is None:
+                if once:
+                    break
+                time.sleep(sleep)
+                continue
+            try:
+                self.process_job(job)
+            except Exception as error:
+                ImportJob.objects.filter(pk=job.pk).update(
+                    status=ImportJob.Status.FAILED,
+                    error=repr(error),
+                    finished_at=timezone.now(),
+                )
+                self.stderr.write(f'Import job {job.pk} failed: {error!r}')
+
+    def claim_job(self, stale_after):
+        with transaction.atomic():
+            job = ImportJob.objects.select_for_update(
+                skip_locked=connection.features.has_select_for_update_skip_locked,
+            ).filter(
+                Q(status=ImportJob.Status.PENDING) | Q(
+                    status=ImportJob.Status.RUNNING,
+                    updated_at__lt=timezone.now() - timedelta(seconds=stale_after),
+                ),
+            ).order_by('created_at').first()
+            if job is not None:
+                job.status = ImportJob.Status.RUNNING
+                job.started_at = job.started_at or timezone.now()
+                job.save(update_fields=['status', 'started_at', 'updated_at'])
+        return job
+
+    def process_job(self, job):
+        with job.file.open('rb') as file:
+            content = io.TextIOWrapper(
+                file.file, encoding='utf-8-sig', newline='')
+            if job.rows_count is None:
+                job.rows_count = count_csv_rows(content)
+                job.save(update_fields=['rows_count', 'updated_at'])
+            if job.checkpoint:
+                self.stdout.write(
+                    f'Resuming {job} from data row {job.checkpoint + 1}')
+
+            def save_chunk(report):
+                rows_count, created_count, elapsed = report.chunks[0]
+                ImportJobError.objects.bulk_create([
+                    ImportJobError(
+                        job=job,
+                        row_number=row_number,
+                        username=username[:150],
+                        message=message,
+                    )
+                    for row_number, username, message in report.errors
+                ])
+                ImportJob.objects.filter(pk=job.pk).update(
+                    checkpoint=F('checkpoint') + rows_count,
+                    created_count=F('created_count') + created_count,
+                    errors_count=F('errors_count') + len(report.errors),
+                    processing_seconds=F('processing_seconds') + elapsed,
+                    updated_at=timezone.now(),
+                )
+                self.stdout.write(
+                    f'{job}: created {created_count} of {rows_count} rows '
+                    f'in {elapsed * 1000:.0f}ms'
+                )
+
+            self.importer.import_file(
+                content, start=job.checkpoint, on_chunk=save_chunk)
+
+        ImportJob.objects.filter(pk=job.pk).update(
+            status=ImportJob.Status.DONE,
+            finished_at=timezone.now(),
+        )
@@ -0,0 +1,124 @@
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import timedelta
+
+import django
+
+from website.thesis.models import Batch
+from ...models import ReportJob, ResultRanking
+from ...reports import (
+    get_report_base_url, get_report_cache_key, render_pdf, render_report_html,
+)
+
+
+class Command(BaseCommand):
+    help = 'Render queued result reports in a pool of worker processes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Number of processes rendering PDFs in parallel.',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=5,
+            help='Seconds to wait when no report is queued.',
+        )
+        parser.add_argument(
+            '--stale-after',
+            type=float,
+            default=15 * 60,
+            help='Seconds after which a running job is assumed lost and queued again.',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once the queue is drained instead of polling.',
+        )
+
+    def handle(self, *args, workers, sleep, stale_after, once, **options):
+        self.base_url = get_report_base_url()
+        with ProcessPoolExecutor(
+                max_workers=workers, initializer=django.setup) as executor:
+            while True:
+                self.requeue_stale_jobs(stale_after)
+                if not self.process_jobs(executor, workers):
+                    if once:
+                        break
+                    time.sleep(sleep)
+
+    def requeue_stale_jobs(self, stale_after):
+        ReportJob.objects.filter(
+            status=ReportJob.Status.RUNNING,
+            started_at__lt=timezone.now() - timedelta(seconds=stale_after),
+        ).update(status=ReportJob.Status.PENDING, started_at=None)
+
+    def claim_jobs(self, count):
+        with transaction.atomic():
+            job_ids = list(ReportJob.objects.select_for_update(
+                skip_locked=connection.features.has_select_for_update_skip_locked,
+            ).filter(
+                status=ReportJob.Status.PENDING,
+            ).order_by('created_at').values_list('pk', flat=True)[:count])
+            ReportJob.objects.filter(pk__in=job_ids).update(
+                status=ReportJob.Status.RUNNING,
+                started_at=timezone.now(),
+            )
+        return list(ReportJob.objects.filter(
+            pk__in=job_ids).select_related('batch'))
+
+    def process_jobs(self, executor, count):
+        jobs = self.claim_jobs(count)
+        rendering = {}
+        for job in jobs:
+            try:
+                ResultRanking.objects.rebuild_stale(
+                    Batch.objects.filter(pk=job.batch_id))
+                html = render_report_html(job.department, job.batch)
+            except Exception as error:
+                self.fail(job, error)
+                continue
+            rendering[job] = html
+        # Worker processes may be forked while submitting, they must not
+        # share this process's database connections.
+        for database_connection in connections.all():
+            if not database_connection.in_atomic_block:
+                database_connection.close()
+
+        started = time.monotonic()
+        futures = {
+            executor.submit(render_pdf, html, self.base_url): job
+            for job, html in rendering.items()
+        }
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                pdf = future.result()
+            except Exception as error:
+                self.fail(job, error)
+                continue
+            job.pdf = pdf
+            job.status = ReportJob.Status.DONE
+            job.finished_at = timezone.now()
+            job.save(update_fields=['pdf', 'status', 'finished_at'])
+            caches['reports'].set(
+                get_report_cache_key(job.department, job.batch), pdf)
+            self.stdout.write(
+                f'Rendered {job} in {(time.monotonic() - started) * 1000:.1f}ms')
+        return len(jobs)
+
+    def fail(self, job, error):
+        job.status = ReportJob.Status.FAILED
+        job.error = repr(error)
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'error', 'finished_at'])
+        self.stderr.write(f'Report job {job.pk} failed: {error!r}')
@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F
+
+import time
+
+from website.thesis.models import Batch
+from ...models import ResultRanking
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the result rankings of all or the given batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'batches',
+            nargs='*',
+            type=int,
+            help='Batch numbers to rebuild, all batches when omitted.',
+        )
+        parser.add_argument(
+            '--stale',
+            action='store_true',
+            help='Only rebuild batches whose results changed since the last build.',
+        )
+        parser.add_argument(
+            '--watch',
+            action='store_true',
+            help='Keep rebuilding stale batches as their results change.',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=5,
+            help='Seconds between checks for stale batches with --watch.',
+        )
+
+    def handle(self, *args, batches, stale, watch, sleep, **options):
+        queryset = Batch.objects.order_by('number')
+        if batches:
+            queryset = queryset.filter(number__in=batches)
+            missing = set(batches) - set(
+                queryset.values_list('number', flat=True))
+            if missing:
+                raise CommandError(
+                    f'Unknown batches: {", ".join(map(str, sorted(missing)))}')
+        if stale or watch:
+            queryset = queryset.exclude(rankings_version=F('results_version'))
+
+        self.rebuild(queryset)
+        while watch:
+            time.sleep(sleep)
+            self.rebuild(queryset.all())
+
+    def rebuild(self, queryset):
+        for batch in queryset:
+            started = time.monotonic()
+            rankings = ResultRanking.objects.rebuild(batch)
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f'{batch}: ranked {len(rankings)} results '
+                f'in {elapsed * 1000:.1f}ms'
+            )
@@ -0,0 +1,34 @@
+# Generated by Django 3.0.14 on 2026-10-18 07:39
+
+from django.db import migrations, models
+
+
+def populate_unread_notifications_count(apps, schema_editor):
+    User = apps.get_model('registration', 'User')
+    Notification = apps.get_model('thesis', 'Notification')
+    unread_counts = Notification.objects.filter(
+        is_viewed=False,
+    ).order_by().values('user').annotate(count=models.Count('pk'))
+    for unread_count in unread_counts:
+        User.objects.filter(pk=unread_count['user']).update(
+            unread_notifications_count=unread_count['count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registration', '0015_auto_20200908_2359'),
+        ('thesis', '0013_notificationoutbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='unread_notifications_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(
+            populate_unread_notifications_count,
+            migrations.RunPython.noop,
+        ),
+    ]
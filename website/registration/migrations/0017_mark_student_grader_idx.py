@@ -0,0 +1,17 @@
+# Generated by Django 3.0.14 on 2026-10-18 07:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registration', '0016_user_unread_notifications_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mark',
+            index=models.Index(fields=['student', 'graded_by'], name='mark_student_grader_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.0.14 on 2026-10-18 07:52
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def populate_marks_count(apps, schema_editor):
+    Result = apps.get_model('registration', 'Result')
+    Mark = apps.get_model('registration', 'Mark')
+    Result.objects.update(marks_count=Coalesce(models.Subquery(
+        Mark.objects.filter(
+            result=models.OuterRef('pk'),
+        ).order_by().values('result').annotate(
+            count=models.Count('pk'),
+        ).values('count'),
+    ), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registration', '0018_reportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='result',
+            name='marks_count',
+            field=models.PositiveSmallIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.RunPython(populate_marks_count, migrations.RunPython.noop),
+    ]
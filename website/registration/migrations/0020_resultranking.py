@@ -0,0 +1,32 @@
+# Generated by Django 3.0.14 on 2026-10-18 07:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('thesis', '0017_batch_rankings_version'),
+        ('registration', '0019_result_marks_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResultRanking',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('department', models.CharField(choices=[('CSE', 'Cse'), ('EEE', 'Eee'), ('ETE', 'Ete'), ('PHM', 'Phm')], max_length=3)),
+                ('total_marks', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('grade', models.CharField(max_length=2)),
+                ('rank', models.PositiveIntegerField()),
+                ('percentile', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('batch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='result_rankings', to='thesis.Batch')),
+                ('result', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='ranking', to='registration.Result')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='resultranking',
+            index=models.Index(fields=['batch', 'department', 'rank'], name='ranking_batch_rank_idx'),
+        ),
+    ]
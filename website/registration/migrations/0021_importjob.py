@@ -0,0 +1,52 @@
+# Generated by Django 3.0.14 on 2026-10-18 07:56
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import website.registration.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registration', '0020_resultranking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(storage=website.registration.models.ImportFileStorage(), upload_to='students/%Y/%m/')),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='PENDING', max_length=7)),
+                ('rows_count', models.PositiveIntegerField(editable=False, null=True)),
+                ('checkpoint', models.PositiveIntegerField(default=0, editable=False)),
+                ('created_count', models.PositiveIntegerField(default=0, editable=False)),
+                ('errors_count', models.PositiveIntegerField(default=0, editable=False)),
+                ('processing_seconds', models.FloatField(default=0, editable=False)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='import_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ImportJobError',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('row_number', models.PositiveIntegerField()),
+                ('username', models.CharField(blank=True, max_length=150)),
+                ('message', models.TextField()),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='errors', to='registration.ImportJob')),
+            ],
+            options={
+                'ordering': ['row_number'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='importjob',
+            index=models.Index(fields=['status', 'created_at'], name='importjob_status_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 3.0.14 on 2026-10-18 08:23
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def copy_unread_notifications_count(apps, schema_editor):
+    User = apps.get_model('registration', 'User')
+    UnreadNotificationsCounter = apps.get_model(
+        'registration', 'UnreadNotificationsCounter')
+    UnreadNotificationsCounter.objects.bulk_create([
+        UnreadNotificationsCounter(user_id=user_id, count=count)
+        for user_id, count in User.objects.filter(
+            unread_notifications_count__gt=0,
+        ).values_list('pk', 'unread_notifications_count').iterator()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registration', '0021_importjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnreadNotificationsCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='unread_notifications_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(
+            copy_unread_notifications_count,
+            migrations.RunPython.noop,
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='unread_notifications_count',
+        ),
+    ]
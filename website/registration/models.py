@@ -1,14 +1,22 @@
 from email.policy import default
-from django.db import models
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import connections, models, transaction
+from django.utils.deconstruct import deconstructible
+from django.utils.functional import cached_property
 from django.core import validators
-from django.db.models import Value, Case, When, Sum, F
+from django.db.models import Value, Case, Count, When, Sum, F, Q, Window
+from django.db.models.functions import PercentRank, Rank
 from django.contrib.auth.models import AbstractUser
 from django.utils.translation import gettext_lazy as _
-from django.core.exceptions import ValidationError
-from django.db.models.signals import pre_save, post_save
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 
 import os
+import re
+import collections
+from decimal import Decimal
 
 
 def generate_propic_upload_location(instance, filename):
@@ -39,6 +47,10 @@ class WebsiteSettings(models.Model):
         return 'Default Settings'
 
 
+# Student ids, e.g. CSE012345, checked on sign up and on import.
+STUDENT_ID_REGEX = re.compile(r'\w+[0-9]{6}')
+
+
 class DepartmentType(models.TextChoices):
     CSE = 'CSE'
     EEE = 'EEE'
@@ -127,6 +139,14 @@ class User(AbstractUser):
     class Meta:
         ordering = ['username']
 
+    @cached_property
+    def unread_notifications_count(self):
+        # Kept in its own table so that saving a user can never write back a
+        # stale counter.
+        return UnreadNotificationsCounter.objects.filter(
+            user_id=self.pk,
+        ).values_list('count', flat=True).first() or 0
+
     def studentgroup_count_by_batch(self, batch):
         return self.studentgroups.filter(
             approved=True,
@@ -156,6 +176,120 @@ class Admin(User):
         proxy = True
 
 
+class UnreadNotificationsCounter(models.Model):
+    user = models.OneToOneField(
+        User,
+        primary_key=True,
+        related_name='unread_notifications_counter',
+        on_delete=models.CASCADE,
+    )
+    count = models.PositiveIntegerField(default=0)
+
+
+# Letter grades with the lowest total marks they need, best grade first.
+GRADE_TABLE = [
+    (80, 'A+'),
+    (75, 'A'),
+    (70, 'A-'),
+    (65, 'B+'),
+    (60, 'B'),
+    (55, 'B-'),
+    (50, 'C+'),
+    (45, 'C'),
+    (40, 'D'),
+    (0, 'F'),
+]
+
+
+def get_grade_range(grade):
+    """
+    Returns the (lower, upper) total marks bounds of `grade`. The upper
+    bound is exclusive and either bound is None when the grade is open
+    ended.
+    """
+    upper_bound = None
+    for lower_bound, table_grade in GRADE_TABLE:
+        if table_grade == grade:
+            if (lower_bound, grade) == GRADE_TABLE[-1]:
+                lower_bound = None
+            return lower_bound, upper_bound
+        upper_bound = lower_bound
+    raise ValueError(f'Unknown grade {grade!r}')
+
+
+def get_grade_filter(grade, field_name='total_marks'):
+    lower_bound, upper_bound = get_grade_range(grade)
+    q = Q()
+    if lower_bound is not None:
+        q &= Q(**{f'{field_name}__gte': lower_bound})
+    if upper_bound is not None:
+        q &= Q(**{f'{field_name}__lt': upper_bound})
+    return q
+
+
+class ResultQuerySet(models.QuerySet):
+    def with_grade(self):
+        return self.annotate(_grade=Case(
+            *[
+                When(total_marks__gte=lower_bound, then=Value(grade))
+                for lower_bound, grade in GRADE_TABLE[:-1]
+            ],
+            default=Value(GRADE_TABLE[-1][1]),
+            output_field=models.CharField(max_length=2),
+        ))
+
+    def grade_distribution(self):
+        """
+        Returns the number of results with each grade, best grade first,
+        counted with a single aggregate query.
+        """
+        counts = self.order_by().aggregate(**{
+            f'grade_{index}': Count('id', filter=get_grade_filter(grade))
+            for index, (_, grade) in enumerate(GRADE_TABLE)
+        })
+        return [
+            (grade, counts[f'grade_{index}'])
+            for index, (_, grade) in enumerate(GRADE_TABLE)
+        ]
+
+    def recompute_total_marks(self, batch_size=500):
+        """
+        Rebuilds `total_marks` and `marks_count` of every result in the
+        queryset from its marks with two aggregate queries, and writes the
+        results that changed with chunked bulk updates. Regular mark saves
+        update both incrementally, this is the repair path.
+        """
+        totals = dict(Mark.objects.filter(
+            student__in=self.values('student'),
+        ).order_by().values('student_id').annotate(
+            total=Sum(WEIGHTED_MARK),
+        ).values_list('student_id', 'total'))
+        marks_counts = dict(Mark.objects.filter(
+            result__in=self.values('pk'),
+        ).order_by().values('result_id').annotate(
+            count=Count('id'),
+        ).values_list('result_id', 'count'))
+        changed = []
+        for result in self.only('id', 'student_id', 'total_marks', 'marks_count'):
+            total_marks = (
+                Decimal(totals.get(result.student_id) or 0) / 100
+            ).quantize(Decimal('0.01'))
+            marks_count = marks_counts.get(result.id, 0)
+            if (result.total_marks, result.marks_count) != (total_marks, marks_count):
+                result.total_marks = total_marks
+                result.marks_count = marks_count
+                changed.append(result)
+        self.model.objects.bulk_update(
+            changed, ['total_marks', 'marks_count'], batch_size=batch_size)
+        if changed:
+            from website.thesis.models import Batch
+
+            Batch.objects.filter(
+                studentgroup__students__result__in=self.values('pk'),
+            ).bump_results_version()
+        return changed
+
+
 class Result(models.Model):
     total_marks = models.DecimalField(
         default=0,
@@ -167,32 +301,28 @@ class Result(models.Model):
         on_delete=models.CASCADE,
         limit_choices_to={"is_student": True}
     )
+    marks_count = models.PositiveSmallIntegerField(
+        default=0,
+        db_index=True,
+        editable=False,
+    )
+
+    objects = ResultQuerySet.as_manager()
+
+    # Supervisor, internal and external
+    REQUIRED_MARKS_COUNT = 3
 
     def __str__(self) -> str:
         return f'{self.student.username} Result'
 
     @property
     def grade(self):
-        if self.total_marks < 40:
-            return 'F'
-        elif self.total_marks < 45:
-            return 'D'
-        elif self.total_marks < 50:
-            return 'C'
-        elif self.total_marks < 55:
-            return 'C+'
-        elif self.total_marks < 60:
-            return 'B-'
-        elif self.total_marks < 65:
-            return 'B'
-        elif self.total_marks < 70:
-            return 'B+'
-        elif self.total_marks < 75:
-            return 'A-'
-        elif self.total_marks < 80:
-            return 'A'
-        else:
-            return 'A+'
+        if '_grade' in self.__dict__:
+            return self._grade
+        for lower_bound, grade in GRADE_TABLE:
+            if self.total_marks >= lower_bound:
+                return grade
+        return GRADE_TABLE[-1][1]
 
 
 class Mark(models.Model):
@@ -224,6 +354,12 @@ class Mark(models.Model):
     class Meta:
         default_related_name = 'marks'
         unique_together = ['studentgroup', 'graded_by', 'student']
+        indexes = [
+            models.Index(
+                fields=['student', 'graded_by'],
+                name='mark_student_grader_idx',
+            ),
+        ]
 
     def clean(self):
         try:
@@ -238,6 +374,332 @@ class Mark(models.Model):
     def __str__(self):
         return f'{self.student} - {self.graded_by} - {self.mark}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    @property
+    def grading(self):
+        """
+        The (student_id, studentgroup_id, graded_by_id, mark) this mark
+        contributed to its student's result when it was loaded or last saved.
+        """
+        loaded_values = getattr(self, '_loaded_values', None)
+        if loaded_values is None:
+            return None
+        return tuple(loaded_values.get(field_name) for field_name in (
+            'student_id', 'studentgroup_id', 'graded_by_id', 'mark'))
+
+
+WEIGHTED_MARK = Case(
+    When(
+        graded_by=F('studentgroup__teacher'),
+        then=F('mark') * F('studentgroup__batch__supervisor_mark_percentage'),
+    ),
+    When(
+        graded_by=F('studentgroup__internal'),
+        then=F('mark') * F('studentgroup__batch__internal_mark_percentage'),
+    ),
+    When(
+        graded_by=F('studentgroup__external'),
+        then=F('mark') * F('studentgroup__batch__external_mark_percentage'),
+    ),
+    default=Value(0),
+    output_field=models.IntegerField(),
+)
+
+
+def add_to_result(student_id, studentgroup, graded_by_id, mark):
+    """
+    Adds the weighted `mark` to the student's result with an atomic update.
+    Pass a negative mark to take a contribution back out.
+    """
+    percentage = studentgroup.mark_percentage(graded_by_id)
+    if mark and percentage:
+        Result.objects.filter(student_id=student_id).update(
+            total_marks=F('total_marks') + Decimal(mark) * percentage / 100,
+        )
+
+
+class ResultRankingManager(models.Manager):
+    def rebuild(self, batch):
+        """
+        Replaces the rankings of the batch with the rank of every result
+        that received all of its marks within its department.
+        """
+        from website.thesis.models import Batch
+
+        results_version = Batch.objects.values_list(
+            'results_version', flat=True).get(pk=batch.pk)
+        results = Result.objects.filter(
+            marks_count=Result.REQUIRED_MARKS_COUNT,
+            student__studentgroup__batch=batch,
+        ).with_grade()
+        if connections[self.db].features.supports_over_clause:
+            rows = self.rank_with_window(results)
+        else:
+            rows = self.rank_in_python(results)
+        rankings = [
+            ResultRanking(
+                result_id=result_id,
+                batch_id=batch.pk,
+                department=department,
+                total_marks=total_marks,
+                grade=grade,
+                rank=rank,
+                percentile=(
+                    Decimal(100 * (1 - percent_rank))
+                ).quantize(Decimal('0.01')),
+            )
+            for result_id, department, total_marks, grade, rank, percent_rank
+            in rows
+        ]
+        with transaction.atomic(using=self.db):
+            self.filter(batch=batch).delete()
+            self.bulk_create(rankings)
+            Batch.objects.filter(pk=batch.pk).update(
+                rankings_version=results_version)
+        return rankings
+
+    def rebuild_stale(self, batches=None):
+        """
+        Rebuilds the rankings of the batches whose results changed since
+        their rankings were built.
+        """
+        from website.thesis.models import Batch
+
+        if batches is None:
+            batches = Batch.objects.all()
+        for batch in batches.exclude(rankings_version=F('results_version')):
+            self.rebuild(batch)
+
+    def rank_with_window(self, results):
+        partition = {
+            'partition_by': [F('student__department')],
+            'order_by': F('total_marks').desc(),
+        }
+        return results.annotate(
+            _rank=Window(Rank(), **partition),
+            _percent_rank=Window(PercentRank(), **partition),
+        ).values_list(
+            'id', 'student__department', 'total_marks', '_grade', '_rank',
+            '_percent_rank',
+        )
+
+    def rank_in_python(self, results):
+        departments = collections.defaultdict(list)
+        for row in results.values_list(
+                'id', 'student__department', 'total_marks', '_grade'):
+            departments[row[1]].append(row)
+        for rows in departments.values():
+            rows.sort(key=lambda row: row[2], reverse=True)
+            rank = 0
+            for index, row in enumerate(rows):
+                if index == 0 or row[2] != rows[index - 1][2]:
+                    rank = index + 1
+                percent_rank = (rank - 1) / (len(rows) - 1) if len(rows) > 1 else 0
+                yield (*row, rank, percent_rank)
+
+
+class ResultRanking(models.Model):
+    result = models.OneToOneField(
+        Result,
+        on_delete=models.CASCADE,
+        related_name='ranking',
+    )
+    batch = models.ForeignKey(
+        'thesis.Batch',
+        on_delete=models.CASCADE,
+        related_name='result_rankings',
+    )
+    department = models.CharField(
+        max_length=3,
+        choices=DepartmentType.choices,
+    )
+    total_marks = models.DecimalField(max_digits=6, decimal_places=2)
+    grade = models.CharField(max_length=2)
+    rank = models.PositiveIntegerField()
+    percentile = models.DecimalField(max_digits=5, decimal_places=2)
+
+    objects = ResultRankingManager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['batch', 'department', 'rank'],
+                name='ranking_batch_rank_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.result} - Rank {self.rank}'
+
+
+class ReportJobQuerySet(models.QuerySet):
+    def enqueue(self, department, batch, requested_by=None):
+        """
+        Returns the job rendering the current results of the batch, queueing
+        a new one unless an earlier request is pending or already done.
+        """
+        job = self.filter(
+            department=department,
+            batch=batch,
+            results_version=batch.results_version,
+        ).exclude(
+            status=ReportJob.Status.FAILED,
+        ).order_by('-created_at').first()
+        if job is None:
+            job = self.create(
+                department=department,
+                batch=batch,
+                results_version=batch.results_version,
+                requested_by=requested_by,
+            )
+        return job
+
+
+class ReportJob(models.Model):
+    class Status(models.TextChoices):
+        PENDING = 'PENDING'
+        RUNNING = 'RUNNING'
+        DONE = 'DONE'
+        FAILED = 'FAILED'
+
+    department = models.CharField(
+        max_length=3,
+        choices=DepartmentType.choices,
+    )
+    batch = models.ForeignKey(
+        'thesis.Batch',
+        on_delete=models.CASCADE,
+        related_name='report_jobs',
+    )
+    results_version = models.PositiveIntegerField()
+    status = models.CharField(
+        max_length=7,
+        choices=Status.choices,
+        default=Status.PENDING,
+    )
+    requested_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='report_jobs',
+    )
+    pdf = models.BinaryField(null=True, editable=False)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    objects = ReportJobQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['status', 'created_at'],
+                name='reportjob_status_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.department} - {self.batch} Report ({self.status})'
+
+
+@deconstructible
+class ImportFileStorage(FileSystemStorage):
+    """
+    Keeps uploaded import files outside of MEDIA_ROOT, they are never
+    served.
+    """
+
+    @property
+    def base_location(self):
+        return settings.IMPORT_FILES_ROOT
+
+    @property
+    def location(self):
+        return os.path.abspath(self.base_location)
+
+
+class ImportJob(models.Model):
+    class Status(models.TextChoices):
+        PENDING = 'PENDING'
+        RUNNING = 'RUNNING'
+        DONE = 'DONE'
+        FAILED = 'FAILED'
+
+    file = models.FileField(
+        upload_to='students/%Y/%m/',
+        storage=ImportFileStorage(),
+    )
+    status = models.CharField(
+        max_length=7,
+        choices=Status.choices,
+        default=Status.PENDING,
+    )
+    requested_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='import_jobs',
+    )
+    rows_count = models.PositiveIntegerField(null=True, editable=False)
+    # Number of rows whose import has been committed
+    checkpoint = models.PositiveIntegerField(default=0, editable=False)
+    created_count = models.PositiveIntegerField(default=0, editable=False)
+    errors_count = models.PositiveIntegerField(default=0, editable=False)
+    processing_seconds = models.FloatField(default=0, editable=False)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['status', 'created_at'],
+                name='importjob_status_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{os.path.basename(self.file.name)} ({self.status})'
+
+    @property
+    def progress(self):
+        if not self.rows_count:
+            return None
+        return self.checkpoint * 100 / self.rows_count
+
+    @property
+    def rows_per_second(self):
+        if not self.processing_seconds:
+            return None
+        return self.checkpoint / self.processing_seconds
+
+
+class ImportJobError(models.Model):
+    job = models.ForeignKey(
+        ImportJob,
+        on_delete=models.CASCADE,
+        related_name='errors',
+    )
+    row_number = models.PositiveIntegerField()
+    username = models.CharField(max_length=150, blank=True)
+    message = models.TextField()
+
+    class Meta:
+        ordering = ['row_number']
+
+    def __str__(self):
+        return f'Row {self.row_number} ({self.username}): {self.message}'
+
 
 @receiver(pre_save, sender=User)
 def remove_studentgroup_if_empty(sender, instance, **kwargs):
@@ -256,11 +718,10 @@ def add_student_to_student_group_if_defined_in_student_list(sender, instance, **
 
     if instance.is_student and not instance.studentgroup:
         student_group = StudentGroup.objects.filter(
-            student_list__contains=instance.username,
+            roster__username=instance.username,
         ).first()
         if student_group:
             instance.studentgroup = student_group
-            instance.save()
 
 
 @receiver(post_save, sender=User)
@@ -269,35 +730,88 @@ def create_result_on_student_creation(sender, instance, **kwargs):
         Result.objects.create(student=instance)
 
 
+def get_grading_studentgroup(studentgroup_id, studentgroup=None):
+    from website.thesis.models import StudentGroup
+
+    if studentgroup is None or studentgroup.pk != studentgroup_id \
+            or not StudentGroup.batch.is_cached(studentgroup):
+        studentgroup = StudentGroup.objects.select_related('batch').get(
+            pk=studentgroup_id)
+    return studentgroup
+
+
+def add_to_marks_count(result_id, count):
+    if result_id is not None:
+        Result.objects.filter(pk=result_id).update(
+            marks_count=F('marks_count') + count)
+
+
+def bump_results_version(*studentgroups):
+    from website.thesis.models import Batch
+
+    Batch.objects.filter(pk__in={
+        studentgroup.batch_id for studentgroup in studentgroups
+    }).bump_results_version()
+
+
 @receiver(post_save, sender=Mark)
-def update_result_on_mark_edit(sender, instance, **kwargs):
-    student = instance.student
-    studentgroup = instance.studentgroup
-    result = Result.objects.filter(student=student).first()
-    if result:
-        result_marks = student.student_marks.annotate(
-            _processed_mark=Case(
-                When(
-                    graded_by=studentgroup.teacher,
-                    then=F(
-                        'mark') * (studentgroup.batch.supervisor_mark_percentage / 100)
-                ),
-                When(
-                    graded_by=studentgroup.internal,
-                    then=F(
-                        'mark') * (studentgroup.batch.internal_mark_percentage / 100)
-                ),
-                When(
-                    graded_by=studentgroup.external,
-                    then=F(
-                        'mark') * (studentgroup.batch.external_mark_percentage / 100)
-                ),
-                default=Value('mark'),
-                output_field=models.DecimalField(),
-            )
-        ).aggregate(
-            total_marks=Sum('_processed_mark')
+def update_result_on_mark_edit(sender, instance, created, **kwargs):
+    studentgroup = get_grading_studentgroup(
+        instance.studentgroup_id,
+        Mark._meta.get_field('studentgroup').get_cached_value(instance, None),
+    )
+    grading = instance.grading
+    if not created and (grading is None or grading[1:3] != (
+            instance.studentgroup_id, instance.graded_by_id)):
+        # The weight the old mark was added with is unknown or differs from
+        # the new one, so no delta can be applied.
+        student_ids = {instance.student_id}
+        if grading is not None:
+            student_ids.add(grading[0])
+        Result.objects.filter(
+            student_id__in=student_ids).recompute_total_marks()
+        bump_results_version(studentgroup)
+    else:
+        if grading:
+            student_id, studentgroup_id, graded_by_id, mark = grading
+            add_to_result(student_id, studentgroup, graded_by_id, -mark)
+        add_to_result(
+            instance.student_id,
+            studentgroup,
+            instance.graded_by_id,
+            instance.mark,
         )
-        print(result_marks)
-        result.total_marks = result_marks['total_marks']
-        result.save()
+        if created:
+            add_to_marks_count(instance.result_id, 1)
+        else:
+            old_result_id = instance._loaded_values.get('result_id')
+            if old_result_id != instance.result_id:
+                add_to_marks_count(old_result_id, -1)
+                add_to_marks_count(instance.result_id, 1)
+        bump_results_version(studentgroup)
+    instance._loaded_values = {
+        'student_id': instance.student_id,
+        'studentgroup_id': instance.studentgroup_id,
+        'graded_by_id': instance.graded_by_id,
+        'mark': instance.mark,
+        'result_id': instance.result_id,
+    }
+
+
+@receiver(post_delete, sender=Mark)
+def update_result_on_mark_delete(sender, instance, **kwargs):
+    if instance.grading is None:
+        # Deleted without being loaded, the instance may not hold what the
+        # mark contributed.
+        Result.objects.filter(
+            student_id=instance.student_id).recompute_total_marks()
+        return
+    student_id, studentgroup_id, graded_by_id, mark = instance.grading
+    try:
+        studentgroup = get_grading_studentgroup(studentgroup_id)
+    except ObjectDoesNotExist:
+        return
+    add_to_result(student_id, studentgroup, graded_by_id, -mark)
+    add_to_marks_count(
+        instance._loaded_values.get('result_id', instance.result_id), -1)
+    bump_results_version(studentgroup)
@@ -0,0 +1,48 @@
+from django.contrib.auth.hashers import make_password
+from django.db import connections
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+
+
+class PasswordHasherPool:
+    """
+    Hashes passwords in a pool of worker processes, one per core by default.
+    Hashing is the dominant CPU cost of importing students, a single
+    process is used when only one worker is asked for.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = None
+
+    def __enter__(self):
+        if self.workers > 1:
+            # Forked workers must not share open database connections.
+            for connection in connections.all():
+                if not connection.in_atomic_block:
+                    connection.close()
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=django.setup)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def hash(self, passwords):
+        """
+        Returns the hashes of `passwords` in order. Empty passwords are
+        hashed as unusable ones.
+        """
+        passwords = [password or None for password in passwords]
+        if self.executor is None or len(passwords) < self.workers:
+            return [make_password(password) for password in passwords]
+        return list(self.executor.map(
+            make_password,
+            passwords,
+            chunksize=max(len(passwords) // (self.workers * 4), 1),
+        ))
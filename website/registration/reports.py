@@ -0,0 +1,131 @@
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+from django.template.loader import render_to_string
+from django_weasyprint.utils import django_url_fetcher
+
+import csv
+import weasyprint
+
+from .models import Mark, Result
+
+REPORT_TEMPLATE_NAME = 'registration/result-report-pdf.html'
+EXPORT_HEADER = [
+    'Matric ID',
+    'Name',
+    'Supervisor Mark',
+    'Internal Mark',
+    'External Mark',
+    'Total Marks',
+    'Grade',
+]
+EXPORT_EXAMINERS = ['teacher', 'internal', 'external']
+
+
+def get_report_results(department, batch_id):
+    """
+    Results of the students of `department` in the batch that received all
+    of their marks.
+    """
+    return Result.objects.filter(
+        marks_count=Result.REQUIRED_MARKS_COUNT,
+        student__department=department,
+        student__studentgroup__batch__id=batch_id,
+    ).with_grade().order_by('student__username')
+
+
+def get_report_context(department, batch, results=None):
+    if results is None:
+        results = get_report_results(department, batch.pk)
+    return {
+        'results': results.select_related('student', 'ranking'),
+        'department': department,
+        'batch': batch,
+        'grade_distribution': results.grade_distribution(),
+    }
+
+
+def get_report_filename(department, batch):
+    return f'{department}-{batch.number}.pdf'
+
+
+def get_report_cache_key(department, batch):
+    return f'result-report:{department}:{batch.pk}:{batch.results_version}'
+
+
+def get_report_base_url():
+    return getattr(settings, 'WEASYPRINT_BASEURL', 'http://localhost/')
+
+
+def render_report_html(department, batch):
+    return render_to_string(
+        REPORT_TEMPLATE_NAME, get_report_context(department, batch))
+
+
+def render_pdf(html, base_url):
+    """
+    Renders `html` to PDF bytes. Runs in the report worker processes, so it
+    must not touch the database.
+    """
+    return weasyprint.HTML(
+        string=html,
+        base_url=base_url,
+        url_fetcher=django_url_fetcher,
+    ).write_pdf(font_config=weasyprint.fonts.FontConfiguration())
+
+
+class Echo:
+    """
+    File-like object that hands back what is written to it, so `csv.writer`
+    can format rows for a streaming response.
+    """
+
+    def write(self, value):
+        return value
+
+
+def get_export_rows(department, batch_id):
+    """
+    Every result of `department` in the batch with the mark of each examiner,
+    as value tuples in the order of `EXPORT_HEADER`.
+    """
+    examiner_marks = {
+        f'{examiner}_mark': Subquery(Mark.objects.filter(
+            student=OuterRef('student'),
+            studentgroup=OuterRef('student__studentgroup'),
+            graded_by=OuterRef(f'student__studentgroup__{examiner}'),
+        ).values('mark')[:1])
+        for examiner in EXPORT_EXAMINERS
+    }
+    return Result.objects.filter(
+        student__department=department,
+        student__studentgroup__batch__id=batch_id,
+    ).annotate(**examiner_marks).with_grade().order_by(
+        'student__username',
+    ).values_list(
+        'student__username',
+        'student__full_name',
+        *examiner_marks,
+        'total_marks',
+        '_grade',
+    )
+
+
+def stream_export_csv(rows, chunk_size=2000):
+    """
+    Yields the CSV export line by line, fetching `rows` from the database in
+    chunks. Starts with a byte order mark so spreadsheets detect UTF-8.
+
+    Chunks are paged by the username that starts each row, not with a
+    server-side cursor, which MySQL drivers buffer whole in memory.
+    """
+    writer = csv.writer(Echo())
+    yield '\ufeff' + writer.writerow(EXPORT_HEADER)
+    chunk = list(rows[:chunk_size])
+    while chunk:
+        for row in chunk:
+            yield writer.writerow(
+                ['' if value is None else value for value in row])
+        if len(chunk) < chunk_size:
+            break
+        chunk = list(rows.filter(
+            student__username__gt=chunk[-1][0])[:chunk_size])
@@ -1,3 +1,626 @@
-from django.test import TestCase
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.hashers import check_password, is_password_usable
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..thesis.models import Batch, StudentGroup
+from .importers import StudentImporter
+from .passwords import PasswordHasherPool
+from .reports import (
+    get_export_rows, get_report_cache_key, stream_export_csv)
+from .models import (
+    GRADE_TABLE, ImportJob, Mark, ReportJob, Result, ResultRanking, User,
+    get_grade_filter)
+
+
+class ResultGradeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for index, total_marks in enumerate([
+                '0', '39.99', '40', '44.99', '45', '52.5', '55', '64.99',
+                '65', '70', '74.5', '75', '79.99', '80', '100']):
+            student = User.objects.create(
+                username=f'S{index:06}', is_student=True)
+            Result.objects.filter(student=student).update(
+                total_marks=Decimal(total_marks))
+
+    def test_annotation_matches_python_grade(self):
+        for result in Result.objects.with_grade():
+            annotated_grade = result.grade
+            del result._grade
+            self.assertEqual(annotated_grade, result.grade, result.total_marks)
+
+    def test_grade_distribution(self):
+        results = list(Result.objects.all())
+        self.assertEqual(Result.objects.grade_distribution(), [
+            (grade, sum(result.grade == grade for result in results))
+            for lower_bound, grade in GRADE_TABLE
+        ])
+
+    def test_grade_filter(self):
+        for lower_bound, grade in GRADE_TABLE:
+            self.assertTrue(all(
+                result.grade == grade
+                for result in Result.objects.filter(get_grade_filter(grade))
+            ))
+
+
+class ResultMarksCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        batch = Batch.objects.create(number=1)
+        cls.teachers = [
+            User.objects.create(username=f'T{index:05}', is_teacher=True)
+            for index in range(3)
+        ]
+        cls.studentgroup = StudentGroup.objects.create(
+            title='Group',
+            department='CSE',
+            batch=batch,
+            teacher=cls.teachers[0],
+            internal=cls.teachers[1],
+            external=cls.teachers[2],
+            approved=True,
+        )
+        cls.student = User.objects.create(
+            username='S00001',
+            is_student=True,
+            studentgroup=cls.studentgroup,
+        )
+
+    def create_mark(self, teacher):
+        return Mark.objects.create(
+            mark=70,
+            studentgroup=self.studentgroup,
+            graded_by=teacher,
+            student=self.student,
+            result=self.student.result,
+        )
+
+    def get_marks_count(self):
+        return Result.objects.get(student=self.student).marks_count
+
+    def test_marks_count_follows_mark_changes(self):
+        marks = [self.create_mark(teacher) for teacher in self.teachers]
+        self.assertEqual(self.get_marks_count(), Result.REQUIRED_MARKS_COUNT)
+
+        mark = Mark.objects.get(pk=marks[0].pk)
+        mark.mark = 80
+        mark.save()
+        self.assertEqual(self.get_marks_count(), 3)
+
+        mark.result = None
+        mark.save()
+        self.assertEqual(self.get_marks_count(), 2)
+
+        marks[1].delete()
+        self.assertEqual(self.get_marks_count(), 1)
+
+    def test_recompute_repairs_marks_count(self):
+        for teacher in self.teachers:
+            self.create_mark(teacher)
+        Result.objects.update(marks_count=0)
+        Result.objects.all().recompute_total_marks()
+        self.assertEqual(self.get_marks_count(), 3)
+
+    def get_result(self):
+        return Result.objects.values_list(
+            'total_marks', 'marks_count').get(student=self.student)
+
+    def assertResultConsistent(self):
+        result = self.get_result()
+        Result.objects.filter(student=self.student).recompute_total_marks()
+        self.assertEqual(result, self.get_result())
+
+    def test_total_marks_follows_edit_and_delete(self):
+        marks = [self.create_mark(teacher) for teacher in self.teachers]
+        mark = Mark.objects.get(pk=marks[0].pk)
+        mark.mark = 85
+        mark.save()
+        self.assertResultConsistent()
+
+        marks[1].delete()
+        self.assertResultConsistent()
+
+    def test_unloaded_mark_resave_does_not_double_count(self):
+        mark = self.create_mark(self.teachers[0])
+        Mark(
+            pk=mark.pk,
+            mark=90,
+            studentgroup=self.studentgroup,
+            graded_by=self.teachers[0],
+            student=self.student,
+            result=self.student.result,
+        ).save()
+        self.assertResultConsistent()
+        self.assertEqual(self.get_marks_count(), 1)
+
+        Mark(pk=mark.pk, student=self.student).delete()
+        self.assertEqual(self.get_result(), (0, 0))
+
+    def test_role_reassignment_keeps_totals(self):
+        for teacher in self.teachers:
+            self.create_mark(teacher)
+        studentgroup = StudentGroup.objects.get(pk=self.studentgroup.pk)
+        studentgroup.teacher, studentgroup.external = (
+            studentgroup.external, studentgroup.teacher)
+        studentgroup.save()
+        self.assertResultConsistent()
+
+        for mark in Mark.objects.all():
+            mark.delete()
+        self.assertEqual(self.get_result(), (0, 0))
+
+
+class ResultRankingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.batch = Batch.objects.create(number=1)
+        studentgroup = StudentGroup.objects.create(
+            title='Group', department='CSE', batch=cls.batch)
+        for index, (department, total_marks, marks_count) in enumerate([
+                ('CSE', '90', 3), ('CSE', '80', 3), ('CSE', '80', 3),
+                ('CSE', '70', 3), ('CSE', '95', 2), ('EEE', '60', 3)]):
+            student = User.objects.create(
+                username=f'S{index:06}',
+                department=department,
+                is_student=True,
+                studentgroup=studentgroup,
+            )
+            Result.objects.filter(student=student).update(
+                total_marks=Decimal(total_marks), marks_count=marks_count)
+
+    def get_results(self):
+        return Result.objects.filter(
+            marks_count=Result.REQUIRED_MARKS_COUNT,
+        ).with_grade()
+
+    def get_rankings(self):
+        return list(ResultRanking.objects.order_by(
+            'department', 'rank', 'result__student__username',
+        ).values_list(
+            'result__student__username', 'rank', 'percentile'))
+
+    def test_python_ranks_share_ties(self):
+        ranks = {
+            result_id: (rank, percent_rank)
+            for result_id, _, _, _, rank, percent_rank
+            in ResultRanking.objects.rank_in_python(self.get_results())
+        }
+        self.assertEqual(sorted(
+            (Result.objects.get(pk=result_id).student.username, rank)
+            for result_id, (rank, _) in ranks.items()
+        ), [
+            ('S000000', 1), ('S000001', 2), ('S000002', 2), ('S000003', 4),
+            ('S000005', 1),
+        ])
+
+    @skipUnlessDBFeature('supports_over_clause')
+    def test_python_ranks_match_window_functions(self):
+        results = self.get_results()
+        self.assertEqual(
+            sorted(
+                (*row[:4], row[4], round(row[5], 6))
+                for row in ResultRanking.objects.rank_in_python(results)),
+            sorted(
+                (*row[:4], row[4], round(row[5], 6))
+                for row in ResultRanking.objects.rank_with_window(results)),
+        )
+
+    def test_rebuild_stores_rank_and_percentile(self):
+        ResultRanking.objects.rebuild(self.batch)
+        self.assertEqual(self.get_rankings(), [
+            ('S000000', 1, Decimal('100.00')),
+            ('S000001', 2, Decimal('66.67')),
+            ('S000002', 2, Decimal('66.67')),
+            ('S000003', 4, Decimal('0.00')),
+            ('S000005', 1, Decimal('100.00')),
+        ])
+
+    def test_changelist_does_not_rebuild(self):
+        ResultRanking.objects.rebuild(self.batch)
+        Result.objects.filter(student__username='S000003').update(
+            total_marks=Decimal('99'))
+        Batch.objects.filter(pk=self.batch.pk).bump_results_version()
+        self.client.force_login(User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'))
+
+        response = self.client.get('/admin/registration/result/')
+        self.assertContains(response, 'Ranks of Batch 1 are out of date')
+        self.assertEqual(self.get_rankings()[0], ('S000000', 1, Decimal('100.00')))
+
+        call_command('rebuild_rankings', '--stale', stdout=StringIO())
+        self.assertEqual(self.get_rankings()[0], ('S000003', 1, Decimal('100.00')))
+        self.batch.refresh_from_db()
+        self.assertFalse(self.batch.rankings_stale)
+
+
+class ResultExportTests(TestCase):
+    def test_export_is_fetched_in_pages(self):
+        batch = Batch.objects.create(number=1)
+        studentgroup = StudentGroup.objects.create(
+            title='Group', department='CSE', batch=batch)
+        for index in reversed(range(5)):
+            User.objects.create(
+                username=f'S{index:06}',
+                full_name='Student',
+                is_student=True,
+                studentgroup=studentgroup,
+            )
+
+        # One query per page of 2 rows, the last page is short.
+        with self.assertNumQueries(3):
+            lines = list(stream_export_csv(
+                get_export_rows('CSE', batch.pk), chunk_size=2))
+        self.assertEqual(
+            [line.split(',')[0] for line in lines[1:]],
+            [f'S{index:06}' for index in range(5)],
+        )
+
+
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'reports': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ReportPDFViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.batch = Batch.objects.create(number=1)
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        ResultRanking.objects.rebuild(cls.batch)
+
+    def setUp(self):
+        caches['reports'].clear()
+        self.client.force_login(self.admin)
+        self.url = reverse('registration:report_pdf', args=('CSE', self.batch.pk))
+
+    def update_batch(self, **values):
+        Batch.objects.filter(pk=self.batch.pk).update(**values)
+        self.batch.refresh_from_db()
+
+    def test_matching_etag_is_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(
+            self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_follows_versions(self):
+        etags = {self.client.get(self.url)['ETag']}
+        self.update_batch(results_version=1)
+        etags.add(self.client.get(self.url)['ETag'])
+        self.update_batch(rankings_version=1)
+        etags.add(self.client.get(self.url)['ETag'])
+        self.assertEqual(len(etags), 3)
+
+    def test_report_is_not_cached_while_rankings_are_stale(self):
+        self.update_batch(results_version=1)
+        self.assertTrue(self.batch.rankings_stale)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        cache_key = get_report_cache_key('CSE', self.batch)
+        self.assertIsNone(caches['reports'].get(cache_key))
+
+        self.update_batch(rankings_version=1)
+        self.client.get(self.url)
+        self.assertIsNotNone(caches['reports'].get(cache_key))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ReportJobTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.batch = Batch.objects.create(number=1, results_version=1)
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        cls.teacher = User.objects.create(username='teacher', is_teacher=True)
+
+    def setUp(self):
+        caches['reports'].clear()
+        self.create_url = reverse(
+            'registration:report_job_create', args=('CSE', self.batch.pk))
+
+    def create_job(self):
+        self.client.force_login(self.admin)
+        return self.client.post(self.create_url).json()
+
+    def process_jobs(self):
+        call_command(
+            'process_report_jobs', '--once', '--workers', '1',
+            stdout=StringIO(), stderr=StringIO())
+
+    def test_endpoints_require_superuser(self):
+        job = ReportJob.objects.enqueue('CSE', self.batch)
+        urls = [
+            reverse('registration:report_job_status', args=(job.pk,)),
+            reverse('registration:report_job_download', args=(job.pk,)),
+        ]
+        for user in [None, self.teacher]:
+            if user is not None:
+                self.client.force_login(user)
+            self.assertEqual(self.client.post(self.create_url).status_code, 403)
+            for url in urls:
+                self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertEqual(ReportJob.objects.count(), 1)
+
+    def test_fresh_small_batch_is_rendered_synchronously(self):
+        ResultRanking.objects.rebuild(self.batch)
+        self.assertEqual(self.create_job(), {
+            'status': ReportJob.Status.DONE,
+            'download_url': reverse(
+                'registration:report_pdf', args=('CSE', self.batch.pk)),
+        })
+        self.assertFalse(ReportJob.objects.exists())
+
+    def test_job_is_rendered_by_worker(self):
+        data = self.create_job()
+        self.assertEqual(data['status'], ReportJob.Status.PENDING)
+        self.assertEqual(self.create_job()['id'], data['id'])
+        download_url = reverse(
+            'registration:report_job_download', args=(data['id'],))
+        self.assertEqual(self.client.get(download_url).status_code, 404)
+
+        self.process_jobs()
+
+        data = self.client.get(data['status_url']).json()
+        self.assertEqual(data['status'], ReportJob.Status.DONE)
+        self.assertEqual(data['download_url'], download_url)
+        self.assertFalse(Batch.objects.get(pk=self.batch.pk).rankings_stale)
+        response = self.client.get(download_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+
+    def test_failed_job_reports_error(self):
+        data = self.create_job()
+        with mock.patch(
+                'website.registration.management.commands.process_report_jobs'
+                '.render_report_html', side_effect=RuntimeError('broken')):
+            self.process_jobs()
+
+        data = self.client.get(data['status_url']).json()
+        self.assertEqual(data['status'], ReportJob.Status.FAILED)
+        self.assertIn('broken', data['error'])
+        batch = Batch.objects.get(pk=self.batch.pk)
+        self.assertNotEqual(
+            ReportJob.objects.enqueue('CSE', batch).pk, data['id'])
+
+
+@override_settings(
+    IMPORT_FILES_ROOT=tempfile.mkdtemp(),
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+)
+class ImportJobTests(TestCase):
+    def test_resumes_from_checkpoint(self):
+        rows = ['id,full_name,email,phone_number,department,cgpa'] + [
+            f'C{index:06},Student,c{index}@example.com,0,CSE,3.5'
+            for index in range(5)
+        ] + ['C000003,Student,,,CSE,']
+        job = ImportJob(checkpoint=2)
+        job.file.save('students.csv', ContentFile('\n'.join(rows)))
+
+        call_command(
+            'process_import_jobs', '--once', '--chunk-size', '2',
+            '--hash-workers', '1', stdout=StringIO())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.Status.DONE)
+        self.assertEqual(job.rows_count, 6)
+        self.assertEqual(job.checkpoint, 6)
+        self.assertEqual(job.created_count, 3)
+        self.assertEqual(list(job.errors.values_list(
+            'row_number', 'username')), [(7, 'C000003')])
+        self.assertEqual(
+            sorted(Result.objects.values_list('student__username', flat=True)),
+            ['C000002', 'C000003', 'C000004'],
+        )
+
+    def test_resumes_after_failing_mid_file(self):
+        rows = ['id,full_name,email,phone_number,department,cgpa'] + [
+            f'C{index:06},Student,c{index}@example.com,0,CSE,3.5'
+            for index in range(6)
+        ]
+        job = ImportJob()
+        job.file.save('students.csv', ContentFile('\n'.join(rows)))
+        hash_passwords = PasswordHasherPool.hash
+        calls = []
+
+        def fail_second_chunk(pool, passwords):
+            calls.append(passwords)
+            if len(calls) == 2:
+                raise RuntimeError('worker lost')
+            return hash_passwords(pool, passwords)
+
+        with mock.patch.object(PasswordHasherPool, 'hash', fail_second_chunk):
+            call_command(
+                'process_import_jobs', '--once', '--chunk-size', '2',
+                '--hash-workers', '1', stdout=StringIO(), stderr=StringIO())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.Status.FAILED)
+        self.assertEqual(job.checkpoint, 2)
+        self.assertEqual(User.objects.count(), 2)
+
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        self.client.force_login(admin)
+        self.client.post(reverse('admin:registration_importjob_changelist'), {
+            'action': 'resume',
+            '_selected_action': [job.pk],
+        })
+        call_command(
+            'process_import_jobs', '--once', '--chunk-size', '2',
+            '--hash-workers', '1', stdout=StringIO())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.Status.DONE)
+        self.assertEqual(job.checkpoint, 6)
+        self.assertEqual(job.created_count, 6)
+        self.assertFalse(job.errors.exists())
+        self.assertEqual(
+            list(User.objects.filter(is_student=True).values_list(
+                'username', flat=True)),
+            [f'C{index:06}' for index in range(6)],
+        )
+        self.assertEqual(Result.objects.count(), 6)
+
+    @override_settings(STUDENT_IMPORT_SYNC_MAX_ROWS=2)
+    def test_upload_with_many_rows_is_queued(self):
+        self.client.force_login(User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'))
+        header = 'id,full_name,email,phone_number,department,cgpa\n'
+        for rows_count in [2, 3]:
+            content = header + ''.join(
+                f'Q{rows_count}{index:05},Student,,,CSE,\n'
+                for index in range(rows_count)
+            )
+            self.client.post('/admin/upload-student-csv/', {
+                'csv_file': SimpleUploadedFile(
+                    'students.csv', content.encode()),
+            })
+
+        self.assertEqual(User.objects.filter(is_student=True).count(), 2)
+        job = ImportJob.objects.get()
+        with job.file.open('rb') as file:
+            self.assertEqual(file.read().decode(), content)
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class StudentImporterTests(TestCase):
+    def get_content(self, rows_count):
+        return StringIO('\n'.join(
+            ['id,full_name,email,phone_number,department,cgpa'] + [
+                f'C{index:06},Student,c{index}@example.com,0,CSE,3.5'
+                for index in range(rows_count)
+            ]))
+
+    def test_inserts_users_per_chunk(self):
+        with CaptureQueriesContext(connection) as context:
+            report = StudentImporter(chunk_size=2).import_file(
+                self.get_content(5))
+
+        self.assertEqual(
+            [(rows_count, created_count)
+             for rows_count, created_count, _ in report.chunks],
+            [(2, 2), (2, 2), (1, 1)],
+        )
+        user_inserts = [
+            query for query in context.captured_queries
+            if query['sql'].startswith('INSERT INTO "registration_user"')
+        ]
+        self.assertEqual(len(user_inserts), 3)
+        self.assertEqual(Result.objects.count(), 5)
+
+    def test_skips_existing_usernames(self):
+        User.objects.create(
+            username='C000001', full_name='Existing', is_student=True)
+        report = StudentImporter(chunk_size=2).import_file(
+            self.get_content(3))
+
+        self.assertEqual(report.created, ['C000000', 'C000002'])
+        self.assertEqual(
+            report.errors, [(3, 'C000001', 'User already exists.')])
+        self.assertEqual(
+            User.objects.get(username='C000001').full_name, 'Existing')
+
+    def test_pooled_hashing_sets_email_passwords(self):
+        report = StudentImporter(hash_workers=2).import_file(
+            self.get_content(4))
+
+        self.assertEqual(len(report.created), 4)
+        for user in User.objects.all():
+            self.assertTrue(check_password(user.email, user.password))
+
+    def test_pool_keeps_password_order(self):
+        with PasswordHasherPool(2) as pool:
+            hashes = pool.hash(['first', 'second', '', 'fourth'])
+
+        self.assertTrue(check_password('first', hashes[0]))
+        self.assertTrue(check_password('second', hashes[1]))
+        self.assertFalse(is_password_usable(hashes[2]))
+        self.assertTrue(check_password('fourth', hashes[3]))
+
+
+class StudentImportValidationTests(TestCase):
+    def test_reports_every_error_without_writing(self):
+        User.objects.create(username='C000002', is_student=True)
+        rows = ['id,full_name,email,phone_number,department,cgpa'] + [
+            f'C{index:06},Student,c{index}@example.com,0,CSE,3.5'
+            for index in range(5)
+        ] + [
+            'C000001,Student,,,CSE,',
+            'student,Student,,,XYZ,4.5',
+            ',Student,,,CSE,',
+        ]
+
+        # One lookup per 3 ids.
+        with self.assertNumQueries(2):
+            report = StudentImporter(chunk_size=3).validate_file(
+                StringIO('\n'.join(rows)))
+
+        self.assertEqual(report.rows_count, 8)
+        self.assertEqual(
+            [(row_number, username) for row_number, username, _ in report.errors],
+            [(4, 'C000002'), (7, 'C000001'), (8, 'student'), (8, 'student'),
+             (9, '')],
+        )
+        self.assertEqual(User.objects.count(), 1)
+
+    @override_settings(
+        PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+    def test_import_rejects_rows_the_dry_run_rejects(self):
+        content = '\n'.join([
+            'id,full_name,email,phone_number,department,cgpa',
+            'C000001,Student,c1@example.com,0,CSE,3.5',
+            'student,Student,s@example.com,0,CSE,3.5',
+            'C000002,Student,c2@example.com,0,XYZ,3.5',
+            'C000001,Student,c1@example.com,0,CSE,3.5',
+        ])
+        importer = StudentImporter()
+        dry_run_report = importer.validate_file(StringIO(content))
+        report = importer.import_file(StringIO(content))
+
+        self.assertEqual(
+            [row_number for row_number, _, _ in report.errors], [3, 4, 5])
+        self.assertEqual(report.errors, dry_run_report.errors)
+        self.assertEqual(
+            list(User.objects.values_list('username', flat=True)),
+            ['C000001'])
+
+    def test_missing_columns(self):
+        report = StudentImporter().validate_file(StringIO('id,email\n'))
+        self.assertEqual(report.errors, [
+            (1, '', 'Missing columns: full_name, department.')])
+
+    @override_settings(
+        PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+    def test_byte_order_mark_file(self):
+        content = '\ufeffid,full_name,email,phone_number,department,cgpa\n'
+        content += 'C000001,Student,c1@example.com,0,CSE,3.5\n'
+        self.client.force_login(User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'))
+
+        response = self.client.post('/admin/upload-student-csv/', {
+            'csv_file': SimpleUploadedFile('students.csv', content.encode()),
+            'dry_run': 'on',
+        })
+        self.assertEqual(response.context['report'].errors, [])
+        self.assertFalse(User.objects.filter(username='C000001').exists())
+
+        self.client.post('/admin/upload-student-csv/', {
+            'csv_file': SimpleUploadedFile('students.csv', content.encode()),
+        })
+        self.assertTrue(User.objects.filter(username='C000001').exists())
@@ -12,6 +12,10 @@ from .views import (
     StudentDetailView,
     change_password,
     ReportPDFView,
+    ReportJobCreateView,
+    ReportJobStatusView,
+    ReportJobDownloadView,
+    ResultExportView,
 )
 
 app_name = 'registration'
@@ -65,8 +69,24 @@ urlpatterns = [
         'students/<username>/',
         StudentDetailView.as_view(),
         name='student_detail'),
+    path(
+        'reports/jobs/<int:pk>/',
+        ReportJobStatusView.as_view(),
+        name='report_job_status'),
+    path(
+        'reports/jobs/<int:pk>/download/',
+        ReportJobDownloadView.as_view(),
+        name='report_job_download'),
     path(
         'reports/<str:department>/<int:batch_id>/',
         ReportPDFView.as_view(),
         name='report_pdf'),
+    path(
+        'reports/<str:department>/<int:batch_id>/jobs/',
+        ReportJobCreateView.as_view(),
+        name='report_job_create'),
+    path(
+        'reports/<str:department>/<int:batch_id>/export/',
+        ResultExportView.as_view(),
+        name='result_export'),
 ]
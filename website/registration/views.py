@@ -1,7 +1,5 @@
 from email import message
-from io import StringIO
-from django.db.models import Count
-from django.contrib import messages
+from django.contrib import admin, messages
 from django.contrib.auth import login
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth import update_session_auth_hash
@@ -12,21 +10,32 @@ from django.views.generic import (
     RedirectView,
     UpdateView,
     ListView,
-    DetailView
+    DetailView,
+    View,
 )
 from django.contrib import messages
-from django.urls import reverse_lazy
-from django.http import HttpResponseRedirect
+from django.conf import settings
+from django.urls import reverse, reverse_lazy
+from django.core.cache import caches
+from django.http import (
+    HttpResponse, HttpResponseRedirect, JsonResponse, StreamingHttpResponse)
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
 from django.views.generic.edit import FormView
 from django_weasyprint import WeasyTemplateResponseMixin
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import get_object_or_404, redirect, render
 
-import csv
+from calendar import timegm
 
 from .forms import (
     CSVUploadForm, StudentSignUpForm, UserUpdateForm, TeacherUpdateForm)
-from .models import Result, User, WebsiteSettings
+from .importers import StudentImporter, count_csv_rows, read_uploaded_csv
+from .models import ImportJob, ReportJob, User, WebsiteSettings
+from .reports import (
+    get_export_rows, get_report_cache_key, get_report_context,
+    get_report_filename, get_report_results, stream_export_csv,
+)
 from ..thesis.models import Batch
 from website.thesis.mixins import UserIsSuperuserMixin
 
@@ -146,6 +155,14 @@ class TeacherDetailView(LoginRequiredMixin, DetailView):
             User, username=self.kwargs['username'])
         return obj
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        if self.object.is_teacher:
+            context['studentgroups'] = self.object.studentgroups.filter(
+                approved=True,
+            ).select_related('batch')
+        return context
+
 
 class StudentDetailView(TeacherDetailView):
     context_object_name = 'student'
@@ -183,29 +200,144 @@ class ReportPDFView(
     template_name = 'registration/result-report-pdf.html'
 
     def get_queryset(self):
-        department = self.kwargs['department']
-        batch_id = self.kwargs['batch_id']
-        return Result.objects.annotate(marks_count=Count('marks')).filter(
-            marks_count=3,
-            student__department=department,
-            student__studentgroup__batch__id=batch_id,
-        ).order_by('student__username')
+        return get_report_results(
+            self.kwargs['department'], self.kwargs['batch_id'])
+
+    def get(self, request, *args, **kwargs):
+        batch = self.get_batch()
+        etag = (
+            f'"{self.kwargs["department"]}-{batch.pk}-{batch.results_version}'
+            f'-{batch.rankings_version}"'
+        )
+        last_modified = batch.results_updated_at and \
+            timegm(batch.results_updated_at.utctimetuple())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = self.get_cached_response(batch, request, *args, **kwargs)
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def get_cached_response(self, batch, request, *args, **kwargs):
+        """
+        Serves the PDF rendered for the current results version of the
+        batch, rendering and caching it on the first request. Reports
+        rendered before the ranks are rebuilt are not cached.
+        """
+        cache = caches['reports']
+        cache_key = get_report_cache_key(self.kwargs['department'], batch)
+        content = cache.get(cache_key)
+        if content is None:
+            response = super().get(request, *args, **kwargs)
+            response.render()
+            if not batch.rankings_stale:
+                cache.set(cache_key, response.content)
+            return response
+        response = HttpResponse(content, content_type=self.content_type)
+        display = 'attachment' if self.pdf_attachment else 'inline'
+        response['Content-Disposition'] = \
+            f'{display};filename="{self.get_pdf_filename()}"'
+        return response
 
     def get_batch(self):
-        return get_object_or_404(Batch, pk=self.kwargs['batch_id'])
+        if not hasattr(self, 'batch'):
+            self.batch = get_object_or_404(Batch, pk=self.kwargs['batch_id'])
+        return self.batch
 
     def get_pdf_filename(self):
-        department = self.kwargs['department']
-        batch = self.get_batch()
-        return f'{department}-{batch.number}.pdf'
+        return get_report_filename(self.kwargs['department'], self.get_batch())
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['department'] = self.kwargs['department']
-        context['batch'] = self.get_batch()
+        context.update(get_report_context(
+            self.kwargs['department'], self.get_batch(), self.object_list))
         return context
 
 
+class ReportJobCreateView(LoginRequiredMixin, UserIsSuperuserMixin, View):
+    """
+    Queues a report render for the worker, which also rebuilds stale ranks.
+    Batches with few results and current ranks are rendered synchronously
+    by `ReportPDFView` instead.
+    """
+    # Fetched by the results changelist script, which expects an error
+    # status rather than the login redirect.
+    raise_exception = True
+    http_method_names = ['post']
+
+    def post(self, request, *args, **kwargs):
+        department = self.kwargs['department']
+        batch = get_object_or_404(Batch, pk=self.kwargs['batch_id'])
+        results_count = get_report_results(department, batch.pk).count()
+        if not batch.rankings_stale and \
+                results_count <= settings.REPORT_SYNC_MAX_RESULTS:
+            return JsonResponse({
+                'status': ReportJob.Status.DONE,
+                'download_url': reverse(
+                    'registration:report_pdf', args=(department, batch.pk)),
+            })
+        job = ReportJob.objects.enqueue(department, batch, request.user)
+        return JsonResponse(get_report_job_data(job), status=202)
+
+
+class ReportJobStatusView(LoginRequiredMixin, UserIsSuperuserMixin, View):
+    raise_exception = True
+    http_method_names = ['get']
+
+    def get(self, request, *args, **kwargs):
+        job = get_object_or_404(
+            ReportJob.objects.defer('pdf'), pk=self.kwargs['pk'])
+        return JsonResponse(get_report_job_data(job))
+
+
+class ReportJobDownloadView(LoginRequiredMixin, UserIsSuperuserMixin, View):
+    raise_exception = True
+    http_method_names = ['get']
+
+    def get(self, request, *args, **kwargs):
+        job = get_object_or_404(
+            ReportJob.objects.select_related('batch'),
+            pk=self.kwargs['pk'],
+            status=ReportJob.Status.DONE,
+        )
+        response = HttpResponse(bytes(job.pdf), content_type='application/pdf')
+        response['Content-Disposition'] = 'inline;filename="{}"'.format(
+            get_report_filename(job.department, job.batch))
+        return response
+
+
+class ResultExportView(LoginRequiredMixin, UserIsSuperuserMixin, View):
+    http_method_names = ['get']
+
+    def get(self, request, *args, **kwargs):
+        department = self.kwargs['department']
+        batch = get_object_or_404(Batch, pk=self.kwargs['batch_id'])
+        response = StreamingHttpResponse(
+            stream_export_csv(get_export_rows(department, batch.pk)),
+            content_type='text/csv; charset=utf-8',
+        )
+        response['Content-Disposition'] = \
+            f'attachment;filename="{department}-{batch.number}.csv"'
+        return response
+
+
+def get_report_job_data(job):
+    data = {
+        'id': job.pk,
+        'status': job.status,
+        'status_url': reverse('registration:report_job_status', args=(job.pk,)),
+    }
+    if job.status == ReportJob.Status.DONE:
+        data['download_url'] = reverse(
+            'registration:report_job_download', args=(job.pk,))
+    elif job.status == ReportJob.Status.FAILED:
+        data['error'] = job.error
+    return data
+
+
 class StudentCSVUploadView(LoginRequiredMixin, UserIsSuperuserMixin, FormView):
     http_method_names = ['post', 'head', 'options']
     form_class = CSVUploadForm
@@ -214,21 +346,44 @@ class StudentCSVUploadView(LoginRequiredMixin, UserIsSuperuserMixin, FormView):
 
     def form_valid(self, form):
         csv_file = form.files.get('csv_file')
-        self.process_csv_file(StringIO(csv_file.read().decode('utf-8')))
+        if form.cleaned_data['dry_run']:
+            return self.validate_csv_file(csv_file)
+        content = read_uploaded_csv(csv_file)
+        max_rows = settings.STUDENT_IMPORT_SYNC_MAX_ROWS
+        if count_csv_rows(content, limit=max_rows + 1) > max_rows:
+            job = ImportJob.objects.create(
+                file=csv_file, requested_by=self.request.user)
+            messages.info(
+                self.request,
+                f'{csv_file.name} is being imported in the background.',
+            )
+            return redirect(
+                reverse('admin:registration_importjob_change', args=(job.pk,)))
+        self.process_csv_file(content)
         return super().form_valid(form)
 
+    def validate_csv_file(self, csv_file):
+        importer = StudentImporter(settings.STUDENT_IMPORT_CHUNK_SIZE)
+        report = importer.validate_file(read_uploaded_csv(csv_file))
+        return render(self.request, 'admin/student_csv_validation.html', {
+            **admin.site.each_context(self.request),
+            'title': f'Validation of {csv_file.name}',
+            'report': report,
+        })
+
     def process_csv_file(self, file):
-        reader = csv.DictReader(file, delimiter=",")
-        successful = []
-        errored = []
-        for row in reader:
-            created, username = self.create_student_for_row(row)
-            if created:
-                successful.append(username)
-            else:
-                errored.append(username)
-        self.show_message(successful, 'success')
-        self.show_message(errored, 'error')
+        # Hashed in this process, worker pools are only started by
+        # `manage.py process_import_jobs`.
+        importer = StudentImporter(settings.STUDENT_IMPORT_CHUNK_SIZE)
+        report = importer.import_file(file)
+        self.show_message(report.created, 'success')
+        self.show_errors(report.errors)
+        for index, (rows_count, created_count, elapsed) in enumerate(report.chunks, 1):
+            messages.info(
+                self.request,
+                f'Chunk {index}: created {created_count} of {rows_count} '
+                f'rows in {elapsed * 1000:.0f}ms.',
+            )
 
     def show_message(self, usernames, message_type):
         count = len(usernames)
@@ -239,21 +394,13 @@ class StudentCSVUploadView(LoginRequiredMixin, UserIsSuperuserMixin, FormView):
             elif message_type == 'error':
                 messages.error(self.request, f'Could not create {count} students. {joined_usernames}')
 
-    def create_student_for_row(self, row):
-        username = row.get('id')
-        if User.objects.filter(username=username).exists():
-            return (False, username)
-        student = User.objects.create(
-            username=row.get('id'),
-            department=row.get('department'),
-            full_name=row.get('full_name'),
-            email=row.get('email'),
-            phone_number=row.get('phone_number'),
-            cgpa=row.get('cgpa'),
-            is_student=True,
-        )
-        student.set_password(row.get('email'))
-        return (True, username)
+    def show_errors(self, errors, limit=50):
+        if errors:
+            messages.error(self.request, f'Could not create {len(errors)} students.')
+        for row_number, username, error in errors[:limit]:
+            messages.error(self.request, f'Row {row_number} ({username}): {error}')
+        if len(errors) > limit:
+            messages.error(self.request, f'... and {len(errors) - limit} more errors.')
 
     def form_invalid(self, form):
         messages.error(self.request, 'Invalid CSV File')
@@ -1,7 +1,6 @@
 from calendar import c
 from website.thesis.forms import LogbookAdminForm
 from django.contrib import admin
-from django.db.models import Max
 from django.contrib.admin.views.main import ChangeList
 
 from .filters import CgpaOrderingFilter
@@ -11,6 +10,7 @@ from .models import (
     Document,
     ResearchField,
     Logbook,
+    NotificationOutbox,
 )
 
 
@@ -43,16 +43,18 @@ class StudentGroupChangeList(ChangeList):
 
 
 class StudentGroupAdmin(admin.ModelAdmin):
-    list_filter = ('batch', 'approved', CgpaOrderingFilter, 'field',)
+    list_filter = ('batch', 'approved', 'stage', CgpaOrderingFilter, 'field',)
     list_display = (
         'title',
         'approved',
+        'status',
         'teacher',
         'internal',
         'external',
         'max_cgpa',
+        'students_count',
     )
-    list_selected_related = ('batch', 'students')
+    list_select_related = ('batch', 'teacher', 'internal', 'external')
     search_fields = ('title',)
     inlines = [DocumentInline]
     readonly_fields = ('first_choice', 'second_choice', 'third_choice',)
@@ -75,9 +77,21 @@ class StudentGroupAdmin(admin.ModelAdmin):
     )
 
     def get_queryset(self, request):
-        return super().get_queryset(request).annotate(
-            _cgpa=Max('students__cgpa'),
-        )
+        return super().get_queryset(request).with_max_cgpa(
+        ).with_students_count()
+
+    def status(self, obj):
+        return obj.status
+    status.admin_order_field = 'stage'
+
+    def max_cgpa(self, obj):
+        return obj.max_cgpa
+    max_cgpa.admin_order_field = '_cgpa'
+
+    def students_count(self, obj):
+        return obj.students_count
+    students_count.admin_order_field = '_students_count'
+    students_count.short_description = 'Members'
 
     def get_changelist(self, request, **kwargs):
         return StudentGroupChangeList
@@ -88,7 +102,14 @@ class LogbookAdmin(admin.ModelAdmin):
     list_display = ('studentgroup', 'time',)
 
 
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    list_display = ('content', 'studentgroup', 'attempts', 'available_at',)
+    list_filter = ('attempts',)
+    readonly_fields = ('last_error',)
+
+
 admin.site.register(Batch)
 admin.site.register(ResearchField)
 admin.site.register(Logbook, LogbookAdmin)
 admin.site.register(StudentGroup, StudentGroupAdmin)
+admin.site.register(NotificationOutbox, NotificationOutboxAdmin)
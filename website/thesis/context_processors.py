@@ -1,11 +1,5 @@
-from .models import Notification
-
-
 def unread_notifications_count(request):
     unread_notifications_count = 0
     if request.user.is_authenticated:
-        unread_notifications_count = Notification.objects.filter(
-            is_viewed=False,
-            user=request.user,
-        ).count()
+        unread_notifications_count = request.user.unread_notifications_count
     return {'unread_notifications_count': unread_notifications_count}
@@ -1,14 +1,17 @@
 from django import forms
+from django.db import transaction
 from django.forms.widgets import DateTimeInput
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 import magic
+from types import MappingProxyType
 
 from ..registration.models import (
     Student, User,
-    Mark,
+    Mark, Result,
 )
 from .models import (
-    Logbook, StudentGroup,
+    Logbook, RosterEntry, StudentGroup,
     Batch,
     Document,
     Comment,
@@ -47,15 +50,24 @@ class StudentGroupForm(forms.ModelForm):
     def clean_student_list(self):
         student_list = self.cleaned_data['student_list']
         student_ids = student_list.split(",")
-        errors = []
-        for student_id in student_ids:
-            processed_student_id = student_id.strip()
-            student = User.objects.filter(username=processed_student_id)
-            student_group = StudentGroup.objects.filter(
-                student_list__contains=processed_student_id,
-            )
-            if (student.exists() and student.first().studentgroup) or student_group:
-                errors.append(f'{student_id} already has a group.')
+        usernames = [student_id.strip() for student_id in student_ids]
+        grouped_students = User.objects.filter(
+            username__in=usernames,
+            studentgroup__isnull=False,
+        )
+        roster = RosterEntry.objects.filter(username__in=usernames)
+        if self.instance.pk:
+            grouped_students = grouped_students.exclude(
+                studentgroup=self.instance)
+            roster = roster.exclude(studentgroup=self.instance)
+        grouped_usernames = set(
+            grouped_students.values_list('username', flat=True),
+        ) | set(roster.values_list('username', flat=True))
+        errors = [
+            f'{student_id} already has a group.'
+            for student_id in student_ids
+            if student_id.strip() in grouped_usernames
+        ]
         if errors:
             raise forms.ValidationError(errors)
         return student_list
@@ -138,6 +150,24 @@ class CommentCreateForm(forms.ModelForm):
 
 
 class BaseMarkFormSet(forms.BaseFormSet):
+    def __init__(self, *args, students=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if students is None:
+            students = self.form_kwargs['studentgroup'].students.select_related(
+                'result').order_by('username')
+        self.students_by_id = MappingProxyType({
+            student.id: student for student in students
+        })
+        self.student_choices = tuple(
+            (student.id, student) for student in self.students_by_id.values()
+        )
+
+    def get_form_kwargs(self, index):
+        kwargs = super().get_form_kwargs(index)
+        kwargs['student_choices'] = self.student_choices
+        kwargs['students_by_id'] = self.students_by_id
+        return kwargs
+
     def clean(self):
         """Checks that no two mark has same student"""
         if any(self.errors):
@@ -152,10 +182,55 @@ class BaseMarkFormSet(forms.BaseFormSet):
             students.add(student)
 
     def save(self, commit=True):
-        instances = []
-        if self.is_valid():
-            for form in self.forms:
-                instances.append(form.save(commit=commit))
+        """
+        Saves the marks of every form in one transaction. Marks the grader
+        already gave are updated in place and each affected result is
+        recomputed once at the end instead of once per mark.
+        """
+        if not self.is_valid():
+            return []
+        user = self.form_kwargs['user']
+        studentgroup = self.form_kwargs['studentgroup']
+        student_ids = [
+            int(form.cleaned_data['student_choice']) for form in self.forms
+        ]
+        students = self.students_by_id
+        if not students.keys() >= set(student_ids):
+            raise Http404('No Student matches the given query.')
+        existing_marks = {
+            mark.student_id: mark
+            for mark in Mark.objects.filter(
+                studentgroup=studentgroup,
+                graded_by=user,
+                student_id__in=student_ids,
+            )
+        }
+
+        instances, created, updated = [], [], []
+        for form, student_id in zip(self.forms, student_ids):
+            student = students[student_id]
+            instance = existing_marks.get(student_id)
+            if instance is None:
+                instance = form.instance
+                created.append(instance)
+            else:
+                updated.append(instance)
+            instance.graded_by = user
+            instance.studentgroup = studentgroup
+            instance.student = student
+            instance.result = getattr(student, 'result', None)
+            instance.mark = form.cleaned_data['mark']
+            instance.remarks = form.cleaned_data['remarks']
+            instances.append(instance)
+
+        if commit:
+            with transaction.atomic():
+                Mark.objects.bulk_update(updated, ['mark', 'remarks', 'result'])
+                Mark.objects.bulk_create(created)
+                # Bumps the batch's results version when a total changes.
+                Result.objects.filter(
+                    student_id__in=student_ids,
+                ).recompute_total_marks()
         return instances
 
 
@@ -178,21 +253,26 @@ class MarkForm(forms.ModelForm):
             'remarks',
         ]
 
-    def __init__(self, *args, user, studentgroup, **kwargs):
+    def __init__(self, *args, user, studentgroup, student_choices=None,
+                 students_by_id=None, **kwargs):
         self.user = user
         self.studentgroup = studentgroup
+        self.students_by_id = students_by_id or {}
         super().__init__(*args, **kwargs)
         for visible in self.visible_fields():
             visible.field.widget.attrs['class'] = 'input'
             if visible.field.required:
                 visible.field.widget.attrs['required'] = ''
-        self.fields['student_choice'].choices = [
-            (s.id, s) for s in studentgroup.students.all()
-        ]
+        if student_choices is None:
+            student_choices = [
+                (s.id, s) for s in studentgroup.students.all()
+            ]
+        self.fields['student_choice'].choices = student_choices
 
     def save(self, commit=True):
         student_id = self.cleaned_data.pop('student_choice')
-        student = get_object_or_404(Student, pk=student_id)
+        student = self.students_by_id.get(int(student_id)) or \
+            get_object_or_404(Student, pk=student_id)
         self.instance.graded_by = self.user
         self.instance.studentgroup = self.studentgroup
         self.instance.student = student
@@ -0,0 +1,87 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+import time
+from datetime import timedelta
+
+from ...models import ArchivedNotification, Notification
+
+
+class Command(BaseCommand):
+    help = (
+        'Move viewed notifications older than --days into the archive table '
+        '(or delete them with --delete) in small batches.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=90,
+            help='Only notifications created more than this many days ago are moved.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of notifications moved per transaction.',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0,
+            help='Seconds to pause between batches to reduce load.',
+        )
+        parser.add_argument(
+            '--delete',
+            action='store_true',
+            help='Delete the notifications instead of archiving them.',
+        )
+
+    def handle(self, *args, days, batch_size, sleep, delete, **options):
+        queryset = Notification.objects.filter(
+            is_viewed=True,
+            created_at__lt=timezone.now() - timedelta(days=days),
+        ).select_for_update(
+            skip_locked=connection.features.has_select_for_update_skip_locked,
+        ).order_by('pk')
+
+        batch_action = 'Deleted' if delete else 'Moved'
+        total = 0
+        started = time.monotonic()
+        while True:
+            batch_started = time.monotonic()
+            with transaction.atomic():
+                notifications = list(queryset.values(
+                    'pk', 'content', 'created_at', 'studentgroup_id', 'user_id',
+                )[:batch_size])
+                if not notifications:
+                    break
+                if not delete:
+                    ArchivedNotification.objects.bulk_create([
+                        ArchivedNotification(
+                            content=notification['content'],
+                            created_at=notification['created_at'],
+                            studentgroup_id=notification['studentgroup_id'],
+                            user_id=notification['user_id'],
+                        )
+                        for notification in notifications
+                    ])
+                Notification.objects.filter(pk__in=[
+                    notification['pk'] for notification in notifications
+                ]).delete()
+            total += len(notifications)
+            elapsed = time.monotonic() - batch_started
+            self.stdout.write(
+                f'{batch_action} {len(notifications)} notifications in '
+                f'{elapsed * 1000:.1f}ms')
+            if sleep:
+                time.sleep(sleep)
+
+        elapsed = time.monotonic() - started
+        action = 'Deleted' if delete else 'Archived'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} {total} notifications in {elapsed:.2f}s '
+            f'({total / elapsed if elapsed else 0:.0f} rows/s).'
+        ))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from ...models import Document, StudentGroup
+
+
+class Command(BaseCommand):
+    help = 'Recalculate the persisted lifecycle stage of every student group.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of groups written per UPDATE statement.',
+        )
+
+    def handle(self, *args, batch_size, **options):
+        accepted_document_types = {}
+        for studentgroup_id, document_type in Document.objects.filter(
+                is_accepted=True).order_by().values_list(
+                'studentgroup_id', 'document_type').distinct():
+            accepted_document_types.setdefault(
+                studentgroup_id, []).append(document_type)
+
+        changed = []
+        studentgroups = StudentGroup.objects.only('id', 'approved', 'stage')
+        for studentgroup in studentgroups.iterator(chunk_size=batch_size):
+            stage = StudentGroup.stage_for(
+                studentgroup.approved,
+                accepted_document_types.get(studentgroup.id, []),
+            )
+            if stage != studentgroup.stage:
+                studentgroup.stage = stage
+                changed.append(studentgroup)
+
+        StudentGroup.objects.bulk_update(
+            changed, ['stage'], batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            f'Updated the stage of {len(changed)} groups.'))
@@ -0,0 +1,198 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+import time
+from uuid import uuid4
+
+from website.registration.models import Mark, User
+from ...models import Batch, Document, Notification, StudentGroup
+
+BENCHMARK_PREFIX = 'BENCH'
+INDEXED_MODELS = [Notification, Document, Mark]
+UNIQUE_FIELDS = [(StudentGroup, 'md5hash')]
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a large dataset in a scratch test database and print the '
+        'query plans and timings of the hot lookups without and with their '
+        'indexes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--groups',
+            type=int,
+            default=2000,
+            help='Number of student groups to seed.',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=50,
+            help='Number of times each query is timed.',
+        )
+
+    def handle(self, *args, groups, repeat, **options):
+        # Indexes are dropped while the queries run, and MySQL can not roll
+        # back schema changes, so nothing runs on the configured database.
+        database_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False)
+        try:
+            started = time.monotonic()
+            with transaction.atomic():
+                self.seed(groups)
+            self.stdout.write(
+                f'Seeded {groups} groups in {time.monotonic() - started:.2f}s')
+
+            queries = self.get_queries()
+            self.remove_indexes()
+            self.run_queries('Without indexes', queries, repeat)
+            self.add_indexes()
+            self.run_queries('With indexes', queries, repeat)
+        finally:
+            connection.creation.destroy_test_db(database_name, verbosity=0)
+
+    def seed(self, groups_count):
+        batch = Batch.objects.create(number=max(
+            Batch.objects.values_list('number', flat=True), default=0) + 1)
+        teachers_count = max(groups_count // 5, 1)
+        User.objects.bulk_create([
+            User(username=f'{BENCHMARK_PREFIX}T{index:06}', is_teacher=True)
+            for index in range(teachers_count)
+        ])
+        teachers = list(User.objects.filter(
+            username__startswith=f'{BENCHMARK_PREFIX}T').order_by('id'))
+
+        StudentGroup.objects.bulk_create([
+            StudentGroup(
+                title=f'{BENCHMARK_PREFIX} Group {index}',
+                department='CSE',
+                batch=batch,
+                teacher=teachers[index % teachers_count],
+                md5hash=uuid4().hex[:8],
+                approved=True,
+                stage=StudentGroup.Stage.SUPERVISOR_APPROVED,
+            )
+            for index in range(groups_count)
+        ])
+        studentgroups = list(StudentGroup.objects.filter(
+            title__startswith=f'{BENCHMARK_PREFIX} Group',
+        ).order_by('id'))
+
+        User.objects.bulk_create([
+            User(
+                username=f'{BENCHMARK_PREFIX}S{studentgroup.id:06}{index}',
+                is_student=True,
+                studentgroup=studentgroup,
+            )
+            for studentgroup in studentgroups
+            for index in range(2)
+        ])
+        students = list(User.objects.filter(
+            username__startswith=f'{BENCHMARK_PREFIX}S',
+        ).select_related('studentgroup').order_by('id'))
+
+        Document.objects.bulk_create([
+            Document(
+                studentgroup=studentgroup,
+                document_type=document_type,
+                file=f'sg_{studentgroup.md5hash}/benchmark.pdf',
+                is_accepted=document_type == Document.DocumentType.PROPOSAL,
+            )
+            for studentgroup in studentgroups
+            for document_type in Document.DocumentType.values
+        ])
+        Notification.objects.bulk_create([
+            Notification(
+                content=f'{BENCHMARK_PREFIX} notification',
+                studentgroup=student.studentgroup,
+                user_id=user_id,
+                is_viewed=index % 3 != 0,
+            )
+            for student in students
+            for user_id in (student.id, student.studentgroup.teacher_id)
+            for index in range(5)
+        ])
+        Mark.objects.bulk_create([
+            Mark(
+                mark=70,
+                studentgroup=student.studentgroup,
+                graded_by=teachers[(student.studentgroup.teacher_id + offset) % teachers_count],
+                student=student,
+            )
+            for student in students
+            for offset in range(min(3, teachers_count))
+        ])
+
+    def get_queries(self):
+        studentgroup = StudentGroup.objects.filter(
+            title__startswith=f'{BENCHMARK_PREFIX} Group').order_by('-id').first()
+        teacher = studentgroup.teacher
+        student = studentgroup.students.first()
+        return [
+            (
+                'Unread notifications of a user',
+                Notification.objects.filter(
+                    user=teacher, is_viewed=False).order_by('-created_at'),
+            ),
+            (
+                'Group by md5hash',
+                StudentGroup.objects.filter(md5hash=studentgroup.md5hash),
+            ),
+            (
+                'Documents of a group by type',
+                Document.objects.filter(
+                    studentgroup=studentgroup,
+                    document_type=Document.DocumentType.PROPOSAL,
+                ).order_by('-is_accepted', '-upload_time'),
+            ),
+            (
+                'Marks of a student by examiner',
+                Mark.objects.filter(student=student, graded_by=teacher),
+            ),
+        ]
+
+    def run_queries(self, title, queries, repeat):
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        for label, queryset in queries:
+            started = time.monotonic()
+            for _ in range(repeat):
+                list(queryset.all())
+            elapsed = (time.monotonic() - started) / repeat
+            self.stdout.write(self.style.MIGRATE_LABEL(
+                f'  {label}: {elapsed * 1000:.3f}ms per query'))
+            for line in queryset.explain().splitlines():
+                self.stdout.write(f'    {line}')
+
+    def get_unique_fields(self):
+        """
+        Pairs each unique field with a copy that is not unique.
+        """
+        pairs = []
+        for model, field_name in UNIQUE_FIELDS:
+            field = model._meta.get_field(field_name)
+            name, path, args, kwargs = field.deconstruct()
+            kwargs['unique'] = False
+            plain_field = field.__class__(*args, **kwargs)
+            plain_field.set_attributes_from_name(name)
+            plain_field.model = model
+            pairs.append((model, field, plain_field))
+        return pairs
+
+    def remove_indexes(self):
+        with connection.schema_editor() as schema_editor:
+            for model in INDEXED_MODELS:
+                for index in model._meta.indexes:
+                    schema_editor.remove_index(model, index)
+            for model, field, plain_field in self.get_unique_fields():
+                schema_editor.alter_field(model, field, plain_field)
+
+    def add_indexes(self):
+        with connection.schema_editor() as schema_editor:
+            for model in INDEXED_MODELS:
+                for index in model._meta.indexes:
+                    schema_editor.add_index(model, index)
+            for model, field, plain_field in self.get_unique_fields():
+                schema_editor.alter_field(model, plain_field, field)
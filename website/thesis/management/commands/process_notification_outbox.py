@@ -0,0 +1,101 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+import time
+from datetime import timedelta
+
+from ...models import Notification, NotificationOutbox
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued notifications from the outbox in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Number of outbox entries delivered per transaction.',
+        )
+        parser.add_argument(
+            '--max-attempts',
+            type=int,
+            default=5,
+            help='Entries that failed this many times are left for inspection.',
+        )
+        parser.add_argument(
+            '--backoff',
+            type=float,
+            default=30,
+            help='Seconds before the first retry, doubled on every attempt.',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=5,
+            help='Seconds to wait when the outbox is empty.',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once the outbox is drained instead of polling.',
+        )
+
+    def handle(self, *args, batch_size, max_attempts, backoff, sleep, once, **options):
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        while True:
+            if not self.process_batch(batch_size):
+                if once:
+                    break
+                time.sleep(sleep)
+
+    def process_batch(self, batch_size):
+        started = time.monotonic()
+        with transaction.atomic():
+            entries = list(NotificationOutbox.objects.select_for_update(
+                skip_locked=connection.features.has_select_for_update_skip_locked,
+            ).filter(
+                available_at__lte=timezone.now(),
+                attempts__lt=self.max_attempts,
+            )[:batch_size])
+            if not entries:
+                return 0
+            try:
+                with transaction.atomic():
+                    notifications = Notification.objects.deliver(
+                        [entry.message for entry in entries])
+                delivered, failed = entries, []
+            except Exception:
+                notifications, delivered, failed = self.deliver_one_by_one(
+                    entries)
+            NotificationOutbox.objects.filter(
+                pk__in=[entry.pk for entry in delivered],
+            ).delete()
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'Delivered {len(delivered)} entries as {len(notifications)} '
+            f'notifications, {len(failed)} failed, in {elapsed * 1000:.1f}ms'
+        )
+        return len(entries)
+
+    def deliver_one_by_one(self, entries):
+        notifications, delivered, failed = [], [], []
+        for entry in entries:
+            try:
+                with transaction.atomic():
+                    notifications += Notification.objects.deliver(
+                        [entry.message])
+                delivered.append(entry)
+            except Exception as error:
+                entry.attempts += 1
+                entry.available_at = timezone.now() + timedelta(
+                    seconds=self.backoff * 2 ** (entry.attempts - 1))
+                entry.last_error = repr(error)
+                entry.save(
+                    update_fields=['attempts', 'available_at', 'last_error'])
+                failed.append(entry)
+                self.stderr.write(f'Outbox entry {entry.pk} failed: {error!r}')
+        return notifications, delivered, failed
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count
+
+import time
+
+from ...models import Batch
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the total marks of every result of the given batches from '
+        'their marks and the current batch mark percentages.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'batches',
+            nargs='*',
+            type=int,
+            help='Batch numbers to recompute, all batches when omitted.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of results written per UPDATE statement.',
+        )
+
+    def handle(self, *args, batches, batch_size, **options):
+        queryset = Batch.objects.order_by('number')
+        if batches:
+            queryset = queryset.filter(number__in=batches)
+            missing = set(batches) - set(
+                queryset.values_list('number', flat=True))
+            if missing:
+                raise CommandError(
+                    f'Unknown batches: {", ".join(map(str, sorted(missing)))}')
+
+        for batch in queryset.annotate(
+                results_count=Count('studentgroup__students__result')):
+            started = time.monotonic()
+            with transaction.atomic():
+                changed = batch.recompute_results(batch_size=batch_size)
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f'{batch}: updated {len(changed)} of {batch.results_count} '
+                f'results in {elapsed * 1000:.1f}ms'
+            )
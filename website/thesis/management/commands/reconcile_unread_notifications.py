@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from ...models import Notification
+
+
+class Command(BaseCommand):
+    help = 'Recalculate the unread notifications counter of every user.'
+
+    def handle(self, *args, **options):
+        updated = Notification.objects.reconcile_unread_counts()
+        self.stdout.write(self.style.SUCCESS(
+            f'Reconciled {updated} unread notifications counters.'))
@@ -0,0 +1,49 @@
+# Generated by Django 3.0.14 on 2026-10-18 07:35
+
+import django.core.validators
+from django.db import migrations, models
+
+DOCUMENT_TYPE_STAGES = {
+    'Proposal': 2,
+    'Pre-Defense Report': 3,
+    'Defense Report': 4,
+}
+
+
+def populate_stage(apps, schema_editor):
+    StudentGroup = apps.get_model('thesis', 'StudentGroup')
+    Document = apps.get_model('thesis', 'Document')
+    accepted_document_types = {}
+    for studentgroup_id, document_type in Document.objects.filter(
+            is_accepted=True).order_by().values_list(
+            'studentgroup_id', 'document_type').distinct():
+        accepted_document_types.setdefault(
+            studentgroup_id, []).append(document_type)
+    for studentgroup in StudentGroup.objects.filter(approved=True):
+        stage = max(
+            [DOCUMENT_TYPE_STAGES[t] for t in accepted_document_types.get(
+                studentgroup.id, [])],
+            default=1,
+        )
+        StudentGroup.objects.filter(pk=studentgroup.pk).update(stage=stage)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('thesis', '0011_studentgroup_student_list'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentgroup',
+            name='stage',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Pending Admin Approval'), (1, 'Supervisor Approved'), (2, 'Proposal Done'), (3, 'Pre-Defense Done'), (4, 'Defense Done')], db_index=True, default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='studentgroup',
+            name='student_list',
+            field=models.CharField(blank=True, max_length=64, validators=[django.core.validators.RegexValidator('(([A-Z]{1,2}\\d{6})+)(,\\s*([A-Z]{1,2}\\d{6})+)*')]),
+        ),
+        migrations.RunPython(populate_stage, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 3.0.14 on 2026-10-18 07:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('thesis', '0012_studentgroup_stage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationOutbox',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content', models.TextField()),
+                ('user_ids', models.TextField(blank=True, help_text='Comma separated recipient ids, all students of the group if empty.')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('studentgroup', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='thesis.StudentGroup')),
+            ],
+            options={
+                'verbose_name_plural': 'notification outbox',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='notificationoutbox',
+            index=models.Index(fields=['available_at', 'attempts'], name='thesis_noti_availab_acbb29_idx'),
+        ),
+    ]
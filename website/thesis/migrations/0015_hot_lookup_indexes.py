@@ -0,0 +1,46 @@
+# Generated by Django 3.0.14 on 2026-10-18 07:41
+
+from django.db import migrations, models
+
+from uuid import uuid4
+
+
+def regenerate_duplicate_md5hashes(apps, schema_editor):
+    StudentGroup = apps.get_model('thesis', 'StudentGroup')
+    seen = set()
+    for studentgroup in StudentGroup.objects.order_by('id'):
+        if studentgroup.md5hash and studentgroup.md5hash not in seen:
+            seen.add(studentgroup.md5hash)
+            continue
+        md5hash = uuid4().hex[:8]
+        while md5hash in seen or StudentGroup.objects.filter(md5hash=md5hash).exists():
+            md5hash = uuid4().hex[:8]
+        seen.add(md5hash)
+        StudentGroup.objects.filter(pk=studentgroup.pk).update(md5hash=md5hash)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('thesis', '0014_archivednotification'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            regenerate_duplicate_md5hashes,
+            migrations.RunPython.noop,
+        ),
+        migrations.AlterField(
+            model_name='studentgroup',
+            name='md5hash',
+            field=models.CharField(max_length=10, null=True, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['studentgroup', 'document_type', 'is_accepted', 'upload_time'], name='document_by_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'is_viewed', 'created_at'], name='notification_unread_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.0.14 on 2026-10-18 07:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('thesis', '0016_batch_results_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='batch',
+            name='rankings_version',
+            field=models.PositiveIntegerField(editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 3.0.14 on 2026-10-18 08:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_roster(apps, schema_editor):
+    StudentGroup = apps.get_model('thesis', 'StudentGroup')
+    RosterEntry = apps.get_model('thesis', 'RosterEntry')
+    entries = []
+    for studentgroup_id, student_list in StudentGroup.objects.exclude(
+            student_list='').values_list('id', 'student_list').iterator():
+        usernames = {
+            username.strip()
+            for username in student_list.split(',')
+            if username.strip()
+        }
+        entries += [
+            RosterEntry(studentgroup_id=studentgroup_id, username=username)
+            for username in sorted(usernames)
+        ]
+    RosterEntry.objects.bulk_create(entries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('thesis', '0017_batch_rankings_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RosterEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('username', models.CharField(db_index=True, max_length=150)),
+                ('studentgroup', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='roster', to='thesis.StudentGroup')),
+            ],
+            options={
+                'verbose_name_plural': 'roster entries',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='rosterentry',
+            constraint=models.UniqueConstraint(fields=('studentgroup', 'username'), name='roster_group_username_uniq'),
+        ),
+        migrations.RunPython(populate_roster, migrations.RunPython.noop),
+    ]
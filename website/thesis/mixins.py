@@ -65,7 +65,10 @@ class StudentGroupContextMixin:
         studentgroup = user.studentgroup
         if user.is_teacher:
             group_code = self.kwargs.get('group_code')
-            studentgroup = get_object_or_404(StudentGroup, md5hash=group_code)
+            studentgroup = get_object_or_404(
+                StudentGroup.objects.with_graded(user),
+                md5hash=group_code,
+            )
         return studentgroup
 
     def get_context_data(self, **kwargs):
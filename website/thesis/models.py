@@ -1,16 +1,23 @@
 from venv import create
-from django.db import models
+from django.db import models, transaction
+from django.db.models import (
+    Case, Count, Exists, F, Max, OuterRef, Subquery, Value, When)
+from django.db.models.functions import Coalesce
 from django.conf import settings
 from django.core import validators
 from django.dispatch import receiver
+from django.utils import timezone
 from django.core.exceptions import ValidationError
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_save, post_delete, pre_delete
 
 import os
+import functools
+import collections
 from uuid import uuid4
 from datetime import datetime
 
-from ..registration.models import DepartmentType
+from ..registration.models import (
+    DepartmentType, Mark, Result, UnreadNotificationsCounter, User)
 
 
 def generate_upload_location(instance, filename):
@@ -21,6 +28,18 @@ def generate_upload_location(instance, filename):
         filename)
 
 
+class BatchQuerySet(models.QuerySet):
+    def bump_results_version(self):
+        """
+        Marks the results of the batches as changed so cached reports of
+        them are rendered again.
+        """
+        return self.update(
+            results_version=F('results_version') + 1,
+            results_updated_at=timezone.now(),
+        )
+
+
 class Batch(models.Model):
     number = models.PositiveSmallIntegerField(unique=True)
     max_groups_num = models.PositiveSmallIntegerField(default=5)
@@ -41,6 +60,18 @@ class Batch(models.Model):
         validators.MinValueValidator(0),
     ])
 
+    results_version = models.PositiveIntegerField(default=0, editable=False)
+    results_updated_at = models.DateTimeField(null=True, editable=False)
+    rankings_version = models.PositiveIntegerField(null=True, editable=False)
+
+    objects = BatchQuerySet.as_manager()
+
+    MARK_PERCENTAGE_FIELDS = [
+        'supervisor_mark_percentage',
+        'internal_mark_percentage',
+        'external_mark_percentage',
+    ]
+
     def clean(self):
         if sum([self.supervisor_mark_percentage, self.internal_mark_percentage, self.external_mark_percentage]) != 100:
             error_message = 'Sum of these must be 100'
@@ -50,6 +81,40 @@ class Batch(models.Model):
                 "external_mark_percentage": error_message,
             })
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    @property
+    def mark_percentages(self):
+        return {
+            field_name: getattr(self, field_name)
+            for field_name in self.MARK_PERCENTAGE_FIELDS
+        }
+
+    @property
+    def rankings_stale(self):
+        return self.rankings_version != self.results_version
+
+    def recompute_results(self, batch_size=500):
+        changed = Result.objects.filter(
+            student__studentgroup__batch=self,
+        ).recompute_total_marks(batch_size=batch_size)
+        # The bumped results version marks the rankings stale for the
+        # ranking worker.
+        return changed
+
+    def save(self, *args, **kwargs):
+        loaded_values = getattr(self, '_loaded_values', None)
+        super().save(*args, **kwargs)
+        if loaded_values and any(
+                loaded_values.get(field_name) != value
+                for field_name, value in self.mark_percentages.items()):
+            transaction.on_commit(self.recompute_results)
+        self._loaded_values = self.mark_percentages
+
     class Meta:
         verbose_name_plural = 'batches'
 
@@ -57,7 +122,82 @@ class Batch(models.Model):
         return f'Batch {self.number}'
 
 
+def annotation_first(annotation):
+    """
+    Returns the queryset annotation `annotation` instead of calling the
+    decorated method when the instance was loaded with it.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if annotation in self.__dict__:
+                return self.__dict__[annotation]
+            return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class StudentGroupQuerySet(models.QuerySet):
+    def with_status(self):
+        """
+        Annotates `_stage`, the stage computed from the accepted documents
+        in SQL, to check the stored `stage` column against. Pages read the
+        column.
+        """
+        accepted_documents = Document.objects.filter(
+            studentgroup=OuterRef('pk'),
+            is_accepted=True,
+        )
+        document_stages = sorted(
+            DOCUMENT_TYPE_STAGES.items(),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+        return self.annotate(_stage=Case(
+            When(approved=False, then=Value(StudentGroup.Stage.PENDING)),
+            *[
+                When(
+                    Exists(accepted_documents.filter(document_type=document_type)),
+                    then=Value(stage),
+                )
+                for document_type, stage in document_stages
+            ],
+            default=Value(StudentGroup.Stage.SUPERVISOR_APPROVED),
+            output_field=models.PositiveSmallIntegerField(),
+        ))
+
+    def with_max_cgpa(self):
+        return self.annotate(_cgpa=Coalesce(
+            Max('students__cgpa'),
+            Value(0),
+            output_field=models.DecimalField(max_digits=5, decimal_places=2),
+        ))
+
+    def with_students_count(self):
+        return self.annotate(_students_count=Count('students'))
+
+    def with_graded(self, user):
+        """
+        Annotates `_graded`, whether `user` has graded the group, and
+        `_graded_by_id`, the user it answers `StudentGroup.graded` for.
+        """
+        return self.annotate(
+            _graded=Exists(Mark.objects.filter(
+                studentgroup=OuterRef('pk'),
+                graded_by=user,
+            )),
+            _graded_by_id=Value(user.pk, output_field=models.IntegerField()),
+        )
+
+
 class StudentGroup(models.Model):
+    class Stage(models.IntegerChoices):
+        PENDING = 0, 'Pending Admin Approval'
+        SUPERVISOR_APPROVED = 1, 'Supervisor Approved'
+        PROPOSAL = 2, 'Proposal Done'
+        PRE_DEFENSE = 3, 'Pre-Defense Done'
+        DEFENSE = 4, 'Defense Done'
+
     teacher = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         null=True,
@@ -116,7 +256,7 @@ class StudentGroup(models.Model):
         max_length=3,
         choices=DepartmentType.choices,
     )
-    md5hash = models.CharField(max_length=10, null=True)
+    md5hash = models.CharField(max_length=10, null=True, unique=True)
     progress = models.IntegerField(default=0)
     student_list = models.CharField(
         max_length=64,
@@ -128,6 +268,12 @@ class StudentGroup(models.Model):
         ],
     )
     approved = models.BooleanField(default=False)
+    stage = models.PositiveSmallIntegerField(
+        choices=Stage.choices,
+        default=Stage.PENDING,
+        db_index=True,
+        editable=False,
+    )
     batch = models.ForeignKey(
         Batch,
         on_delete=models.SET_NULL,
@@ -141,42 +287,167 @@ class StudentGroup(models.Model):
         on_delete=models.SET_NULL,
     )
 
+    objects = StudentGroupQuerySet.as_manager()
+
+    EXAMINER_FIELDS = ['teacher_id', 'internal_id', 'external_id']
+
+    def _get_prefetched(self, related_name):
+        return getattr(self, '_prefetched_objects_cache', {}).get(related_name)
+
     @property
+    @annotation_first('_cgpa')
     def max_cgpa(self):
-        student = self.students.all().order_by('-cgpa').first()
-        if student:
-            return student.cgpa
-        return 0
+        students = self._get_prefetched('students')
+        if students is not None:
+            return max(
+                [student.cgpa for student in students if student.cgpa],
+                default=0,
+            )
+        return self.students.aggregate(cgpa=Max('cgpa'))['cgpa'] or 0
+
+    @property
+    @annotation_first('_students_count')
+    def students_count(self):
+        students = self._get_prefetched('students')
+        if students is not None:
+            return len(students)
+        return self.students.count()
 
     @property
     def status(self):
-        documents_queryset = self.documents.filter(is_accepted=True)
-        if not self.approved:
-            return 'Pending Admin Approval'
-        elif documents_queryset.filter(document_type=Document.DocumentType.DEFENSE.value).exists():
-            return 'Defense Done'
-        elif documents_queryset.filter(document_type=Document.DocumentType.PRE_DEFENSE.value).exists():
-            return 'Pre-Defense Done'
-        elif documents_queryset.filter(document_type=Document.DocumentType.PROPOSAL.value).exists():
-            return 'Proposal Done'
-        else:
-            return 'Supervisor Approved'
+        stage = self.__dict__.get('_stage', self.stage)
+        return self.Stage(stage).label
+
+    @classmethod
+    def stage_for(cls, approved, accepted_document_types):
+        if not approved:
+            return cls.Stage.PENDING
+        return max(
+            [DOCUMENT_TYPE_STAGES[t] for t in accepted_document_types],
+            default=cls.Stage.SUPERVISOR_APPROVED,
+        )
+
+    def compute_stage(self):
+        accepted_document_types = []
+        if self.pk:
+            accepted_document_types = self.documents.filter(
+                is_accepted=True,
+            ).order_by().values_list('document_type', flat=True).distinct()
+        return self.stage_for(self.approved, accepted_document_types)
+
+    def update_stage(self):
+        self.stage = self.compute_stage()
+        StudentGroup.objects.filter(pk=self.pk).update(stage=self.stage)
 
     def graded(self, user):
+        if '_graded' in self.__dict__ and \
+                self.__dict__.get('_graded_by_id') == user.pk:
+            return self.__dict__['_graded']
+        marks = self._get_prefetched('marks')
+        if marks is not None:
+            return any(mark.graded_by_id == user.pk for mark in marks)
         return self.marks.filter(graded_by=user).exists()
 
+    def mark_percentage(self, user_id):
+        """
+        Returns the weight, in percent, that the batch gives to the marks
+        `user_id` awards in this group.
+        """
+        if user_id == self.teacher_id:
+            return self.batch.supervisor_mark_percentage
+        elif user_id == self.internal_id:
+            return self.batch.internal_mark_percentage
+        elif user_id == self.external_id:
+            return self.batch.external_mark_percentage
+        return 0
+
     class Meta:
         ordering = ['id']
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    @property
+    def examiner_ids(self):
+        return {
+            field_name: getattr(self, field_name)
+            for field_name in self.EXAMINER_FIELDS
+        }
+
     def save(self, *args, **kwargs):
         if not self.md5hash:
             self.md5hash = uuid4().hex[:8]
-        return super().save(*args, **kwargs)
+        if not self.approved:
+            self.stage = self.Stage.PENDING
+        elif self.stage == self.Stage.PENDING:
+            self.stage = self.compute_stage()
+        update_fields = kwargs.get('update_fields')
+        loaded_values = getattr(self, '_loaded_values', None)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if update_fields is None or 'student_list' in update_fields:
+                self.sync_roster()
+            if loaded_values and any(
+                    loaded_values.get(field_name) != value
+                    for field_name, value in self.examiner_ids.items()):
+                # Marks are weighted by their examiner's role in the group.
+                Result.objects.filter(
+                    student__studentgroup=self).recompute_total_marks()
+        self._loaded_values = self.examiner_ids
+
+    def sync_roster(self):
+        """
+        Mirrors `student_list` into the indexed roster table, which is what
+        groups are looked up by.
+        """
+        usernames = set(parse_student_list(self.student_list))
+        rostered = set(self.roster.values_list('username', flat=True))
+        if rostered - usernames:
+            self.roster.filter(username__in=rostered - usernames).delete()
+        RosterEntry.objects.bulk_create([
+            RosterEntry(studentgroup=self, username=username)
+            for username in sorted(usernames - rostered)
+        ])
 
     def __str__(self):
         return f'{self.department}_{self.batch.number}_{self.id}'
 
 
+def parse_student_list(student_list):
+    return [
+        username.strip()
+        for username in (student_list or '').split(',')
+        if username.strip()
+    ]
+
+
+class RosterEntry(models.Model):
+    """
+    A student id listed in `StudentGroup.student_list`.
+    """
+    studentgroup = models.ForeignKey(
+        StudentGroup,
+        on_delete=models.CASCADE,
+        related_name='roster',
+    )
+    username = models.CharField(max_length=150, db_index=True)
+
+    class Meta:
+        verbose_name_plural = 'roster entries'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['studentgroup', 'username'],
+                name='roster_group_username_uniq',
+            ),
+        ]
+
+    def __str__(self):
+        return self.username
+
+
 class Document(models.Model):
     class DocumentType(models.TextChoices):
         PROPOSAL = "Proposal"
@@ -197,6 +468,12 @@ class Document(models.Model):
 
     class Meta:
         ordering = ['-upload_time', ]
+        indexes = [
+            models.Index(
+                fields=['studentgroup', 'document_type', 'is_accepted', 'upload_time'],
+                name='document_by_type_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.filename
@@ -206,6 +483,13 @@ class Document(models.Model):
         return os.path.basename(self.file.name)
 
 
+DOCUMENT_TYPE_STAGES = {
+    Document.DocumentType.PROPOSAL: StudentGroup.Stage.PROPOSAL,
+    Document.DocumentType.PRE_DEFENSE: StudentGroup.Stage.PRE_DEFENSE,
+    Document.DocumentType.DEFENSE: StudentGroup.Stage.DEFENSE,
+}
+
+
 class Logbook(models.Model):
     class MeetingType(models.TextChoices):
         ON_SITE = "On-Site"
@@ -274,6 +558,172 @@ class ResearchField(models.Model):
         return self.name
 
 
+class NotificationQuerySet(models.QuerySet):
+    def delete(self):
+        """
+        Deletes the notifications and takes the unread ones off their
+        users' unread counters.
+        """
+        with transaction.atomic(using=self.db):
+            unread_counts = dict(self.filter(is_viewed=False).order_by(
+            ).values('user').annotate(
+                count=Count('pk'),
+            ).values_list('user', 'count'))
+            deleted = super().delete()
+            Notification.objects.decrement_unread_counts(unread_counts)
+        return deleted
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
+class NotificationManager(models.Manager.from_queryset(NotificationQuerySet)):
+    def notify(self, studentgroup, content, user_ids=None):
+        """
+        Notifies the users in `user_ids`, or every student of `studentgroup`
+        when it is None. With NOTIFICATIONS_USE_OUTBOX the message is queued
+        in the outbox with its recipients resolved now, otherwise it is
+        delivered once the current transaction commits.
+        """
+        if user_ids is not None:
+            user_ids = [user_id for user_id in user_ids if user_id]
+            if not user_ids:
+                return
+        if settings.NOTIFICATIONS_USE_OUTBOX:
+            if user_ids is None:
+                user_ids = list(
+                    studentgroup.students.values_list('id', flat=True))
+                if not user_ids:
+                    return
+            NotificationOutbox.objects.create(
+                studentgroup=studentgroup,
+                content=content,
+                user_ids=','.join(str(user_id) for user_id in user_ids),
+            )
+        else:
+            transaction.on_commit(lambda: self.deliver([
+                (studentgroup.pk, content, user_ids),
+            ]))
+
+    def deliver(self, messages):
+        """
+        Creates the notifications for `messages`, a list of
+        `(studentgroup_id, content, user_ids)` tuples, with one query to
+        look up students and a single bulk_create.
+        """
+        studentgroup_ids = {
+            studentgroup_id
+            for studentgroup_id, _, user_ids in messages
+            if user_ids is None
+        }
+        students = {}
+        if studentgroup_ids:
+            for studentgroup_id, user_id in User.objects.filter(
+                    studentgroup_id__in=studentgroup_ids,
+            ).values_list('studentgroup_id', 'id'):
+                students.setdefault(studentgroup_id, []).append(user_id)
+        notifications = self.bulk_create([
+            self.model(
+                content=content,
+                studentgroup_id=studentgroup_id,
+                user_id=user_id,
+            )
+            for studentgroup_id, content, user_ids in messages
+            for user_id in (
+                students.get(studentgroup_id, [])
+                if user_ids is None else user_ids
+            )
+        ])
+        self.increment_unread_counts(
+            [notification.user_id for notification in notifications])
+        return notifications
+
+    def mark_read(self, user=None, studentgroup=None):
+        """
+        Marks the unread notifications of `user` and/or `studentgroup`, or
+        every unread notification when neither is given, as viewed with a
+        single UPDATE and returns how many were marked.
+        """
+        filters = {}
+        if user is not None:
+            filters['user'] = user
+        if studentgroup is not None:
+            filters['studentgroup'] = studentgroup
+        marked = self.filter(is_viewed=False, **filters).update(is_viewed=True)
+        if user is not None:
+            self.decrement_unread_count(user.pk, marked)
+        elif marked:
+            users = User.objects.all()
+            if studentgroup is not None:
+                users = users.filter(pk__in=self.filter(
+                    studentgroup=studentgroup,
+                ).values('user'))
+            self.reconcile_unread_counts(users)
+        return marked
+
+    def increment_unread_counts(self, user_ids):
+        user_ids_by_count = {}
+        for user_id, count in collections.Counter(user_ids).items():
+            user_ids_by_count.setdefault(count, []).append(user_id)
+        UnreadNotificationsCounter.objects.bulk_create([
+            UnreadNotificationsCounter(user_id=user_id)
+            for user_ids in user_ids_by_count.values()
+            for user_id in user_ids
+        ], ignore_conflicts=True)
+        for count, user_ids in user_ids_by_count.items():
+            UnreadNotificationsCounter.objects.filter(
+                user_id__in=user_ids,
+            ).update(count=F('count') + count)
+
+    def decrement_unread_count(self, user_id, count):
+        self.decrement_unread_counts({user_id: count})
+
+    def decrement_unread_counts(self, counts):
+        """
+        Subtracts `counts`, a mapping of user ids to numbers of notifications,
+        from the users' unread counters without going below zero.
+        """
+        user_ids_by_count = {}
+        for user_id, count in counts.items():
+            if count:
+                user_ids_by_count.setdefault(count, []).append(user_id)
+        for count, user_ids in user_ids_by_count.items():
+            UnreadNotificationsCounter.objects.filter(
+                user_id__in=user_ids,
+            ).update(count=Case(
+                When(count__gte=count, then=F('count') - count),
+                default=Value(0),
+            ))
+
+    def reconcile_unread_counts(self, users=None):
+        """
+        Recalculates the unread notifications counter of `users`, a User
+        queryset defaulting to everyone, and returns the number of counters
+        updated.
+        """
+        if users is None:
+            users = User.objects.all()
+        UnreadNotificationsCounter.objects.bulk_create([
+            UnreadNotificationsCounter(user_id=user_id)
+            for user_id in self.filter(
+                user__in=users,
+                is_viewed=False,
+            ).order_by().values_list('user', flat=True).distinct()
+        ], ignore_conflicts=True)
+        unread_count = self.filter(
+            user=OuterRef('user'),
+            is_viewed=False,
+        ).order_by().values('user').annotate(
+            count=Count('pk'),
+        ).values('count')
+        return UnreadNotificationsCounter.objects.filter(
+            user__in=users,
+        ).update(count=Coalesce(
+            Subquery(unread_count, output_field=models.PositiveIntegerField()),
+            Value(0),
+        ))
+
+
 class Notification(models.Model):
     content = models.TextField()
     is_viewed = models.BooleanField(default=False)
@@ -287,13 +737,78 @@ class Notification(models.Model):
         on_delete=models.CASCADE,
     )
 
+    objects = NotificationManager()
+
     class Meta:
         ordering = ['-created_at']
         default_related_name = 'notifications'
+        indexes = [
+            models.Index(
+                fields=['user', 'is_viewed', 'created_at'],
+                name='notification_unread_idx',
+            ),
+        ]
 
     def __str__(self):
         return f'Notification {self.content[:20]}'
 
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            deleted = super().delete(*args, **kwargs)
+            if not self.is_viewed:
+                Notification.objects.decrement_unread_count(self.user_id, 1)
+        return deleted
+
+
+class ArchivedNotification(models.Model):
+    content = models.TextField()
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    studentgroup_id = models.PositiveIntegerField()
+    user_id = models.PositiveIntegerField(db_index=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f'Archived Notification {self.content[:20]}'
+
+
+class NotificationOutbox(models.Model):
+    content = models.TextField()
+    studentgroup = models.ForeignKey(
+        StudentGroup,
+        on_delete=models.CASCADE,
+    )
+    user_ids = models.TextField(
+        blank=True,
+        help_text='Comma separated recipient ids, all students of the group if empty.',
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    available_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['id']
+        verbose_name_plural = 'notification outbox'
+        indexes = [
+            models.Index(fields=['available_at', 'attempts']),
+        ]
+
+    def __str__(self):
+        return f'Outbox {self.content[:20]}'
+
+    @property
+    def recipient_ids(self):
+        if not self.user_ids:
+            return None
+        return [int(user_id) for user_id in self.user_ids.split(',')]
+
+    @property
+    def message(self):
+        return (self.studentgroup_id, self.content, self.recipient_ids)
+
 
 @receiver(post_save, sender=Document)
 def generate_notification_on_document_upload(sender, instance, created, **kwargs):
@@ -301,47 +816,26 @@ def generate_notification_on_document_upload(sender, instance, created, **kwargs
     if created:
         content = f'A new Document({instance.document_type}) was uploaded to {studentgroup}'
         if studentgroup.approved:
-            if studentgroup.teacher:
-                Notification.objects.create(
-                    content=content,
-                    user=studentgroup.teacher,
-                    studentgroup=studentgroup,
-                )
-            # if studentgroup.internal:
-            #     Notification.objects.create(
-            #         content=content,
-            #         user=studentgroup.internal,
-            #         studentgroup=studentgroup,
-            #     )
-            # if studentgroup.external:
-            #     Notification.objects.create(
-            #         content=content,
-            #         user=studentgroup.external,
-            #         studentgroup=studentgroup,
-            #     )
+            Notification.objects.notify(
+                studentgroup, content, [studentgroup.teacher_id])
+            # Notification.objects.notify(
+            #     studentgroup,
+            #     content,
+            #     [studentgroup.internal_id, studentgroup.external_id],
+            # )
     else:
         if instance.is_accepted:
             content = f'Your {instance.filename}({instance.document_type}) document was approved.'
         else:
             content = f'Your {instance.filename}({instance.document_type}) document was disapproved.'
-        for student in studentgroup.students.all():
-            Notification.objects.create(
-                content=content,
-                user=student,
-                studentgroup=studentgroup,
-            )
+        Notification.objects.notify(studentgroup, content)
 
 
 @receiver(post_save, sender=Comment)
-def generate_notification_on_teacher_comment(sender, instance, **kwargs):
-    studentgroup = instance.studentgroup
-    content = f'There is a new comment in your group by {instance.user}'
-    for student in studentgroup.students.all():
-        Notification.objects.create(
-            content=content,
-            user=student,
-            studentgroup=studentgroup,
-        )
+def generate_notification_on_teacher_comment(sender, instance, created, **kwargs):
+    if created:
+        content = f'There is a new comment in your group by {instance.user}'
+        Notification.objects.notify(instance.studentgroup, content)
 
 
 @receiver(post_save, sender=Logbook)
@@ -349,12 +843,21 @@ def generate_notification_on_logbook_submission(sender, instance, created, **kwa
     if created:
         studentgroup = instance.studentgroup
         content = f'A new Log book(#{instance.id}) has been uploaded in {studentgroup}'
-        if studentgroup.teacher:
-            Notification.objects.create(
-                content=content,
-                user=studentgroup.teacher,
-                studentgroup=studentgroup,
-            )
+        Notification.objects.notify(
+            studentgroup, content, [studentgroup.teacher_id])
+
+
+@receiver(pre_delete, sender=StudentGroup)
+def delete_notifications_on_studentgroup_delete(sender, instance, **kwargs):
+    # Deleted through the queryset, unlike the cascade, so their users'
+    # unread counters are updated.
+    Notification.objects.filter(studentgroup=instance).delete()
+
+
+@receiver(post_save, sender=Document)
+@receiver(post_delete, sender=Document)
+def update_studentgroup_stage_on_document_change(sender, instance, **kwargs):
+    instance.studentgroup.update_stage()
 
 
 @receiver(post_delete, sender=Document)
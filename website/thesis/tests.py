@@ -1,3 +1,506 @@
-from django.test import TestCase
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.forms import formset_factory
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
 
-# Create your tests here.
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from ..registration.models import Mark, Result, ResultRanking, User
+from .forms import BaseMarkFormSet, MarkForm, StudentGroupForm
+from .models import (
+    ArchivedNotification, Batch, Document, Notification, NotificationOutbox,
+    ResearchField, RosterEntry, StudentGroup)
+from .views import BaseGroupListView
+
+
+class StudentGroupWithStatusTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        batch = Batch.objects.create(number=1)
+        cls.document_types = [None] + list(Document.DocumentType.values)
+        for document_type in cls.document_types:
+            studentgroup = StudentGroup.objects.create(
+                title=f'Group {document_type}',
+                department='CSE',
+                batch=batch,
+                approved=True,
+            )
+            if document_type:
+                Document.objects.bulk_create([
+                    Document(
+                        studentgroup=studentgroup,
+                        document_type=document_type,
+                        file='document.pdf',
+                        is_accepted=True,
+                    ),
+                ])
+        StudentGroup.objects.create(
+            title='Pending Group',
+            department='CSE',
+            batch=batch,
+        )
+
+    def test_annotation_matches_computed_stage(self):
+        for studentgroup in StudentGroup.objects.with_status():
+            self.assertEqual(studentgroup._stage, studentgroup.compute_stage())
+
+    def test_status_is_rendered_in_one_query(self):
+        with self.assertNumQueries(1):
+            statuses = [
+                studentgroup.status
+                for studentgroup in StudentGroup.objects.with_status()
+            ]
+        self.assertEqual(statuses, [
+            'Supervisor Approved',
+            'Proposal Done',
+            'Pre-Defense Done',
+            'Defense Done',
+            'Pending Admin Approval',
+        ])
+
+
+class StudentGroupGradedTests(TestCase):
+    def test_annotation_only_answers_for_its_user(self):
+        teachers = [
+            User.objects.create(username=f'teacher{index}', is_teacher=True)
+            for index in range(2)
+        ]
+        studentgroup = StudentGroup.objects.create(
+            title='Group',
+            department='CSE',
+            batch=Batch.objects.create(number=1),
+            teacher=teachers[0],
+            internal=teachers[1],
+        )
+        student = User.objects.create(
+            username='C000001', is_student=True, studentgroup=studentgroup)
+        Mark.objects.create(
+            mark=70,
+            studentgroup=studentgroup,
+            graded_by=teachers[0],
+            student=student,
+            result=student.result,
+        )
+
+        studentgroup = StudentGroup.objects.with_graded(teachers[1]).get()
+        with self.assertNumQueries(0):
+            self.assertFalse(studentgroup.graded(teachers[1]))
+        with self.assertNumQueries(1):
+            self.assertTrue(studentgroup.graded(teachers[0]))
+
+
+class GroupListQueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.batch = Batch.objects.create(number=1)
+        cls.teacher = User.objects.create(username='teacher', is_teacher=True)
+
+    def create_groups(self, count):
+        for _ in range(count):
+            studentgroup = StudentGroup.objects.create(
+                title='Group',
+                department='CSE',
+                batch=self.batch,
+                teacher=self.teacher,
+                approved=True,
+            )
+            User.objects.filter(pk__in=[
+                User.objects.create(
+                    username=f'C{studentgroup.id}{index:05}',
+                    is_student=True,
+                ).pk
+                for index in range(2)
+            ]).update(studentgroup=studentgroup)
+
+    def count_queries(self, url_name='thesis:group_list'):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse(url_name))
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def test_group_list_query_count_is_constant(self):
+        self.client.force_login(self.teacher)
+        self.create_groups(1)
+        queries = self.count_queries()
+        self.create_groups(BaseGroupListView.paginate_by)
+        self.assertEqual(self.count_queries(), queries)
+
+    def test_status_is_read_from_stage_column(self):
+        self.client.force_login(self.teacher)
+        self.create_groups(2)
+        StudentGroup.objects.filter(
+            pk=StudentGroup.objects.first().pk,
+        ).update(stage=StudentGroup.Stage.PROPOSAL)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(
+                reverse('thesis:group_list'),
+                {'stage': StudentGroup.Stage.PROPOSAL},
+            )
+        self.assertEqual(
+            [group.status for group in response.context['object_list']],
+            ['Proposal Done'],
+        )
+        self.assertFalse(any(
+            'thesis_document' in query['sql']
+            for query in context.captured_queries))
+
+    def test_admin_changelist_query_count_is_constant(self):
+        self.client.force_login(User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'))
+        url_name = 'admin:thesis_studentgroup_changelist'
+        self.create_groups(1)
+        StudentGroup.objects.update(
+            internal=self.teacher, external=self.teacher)
+        queries = self.count_queries(url_name)
+        self.create_groups(10)
+        StudentGroup.objects.update(
+            internal=self.teacher, external=self.teacher)
+        self.assertEqual(self.count_queries(url_name), queries)
+
+
+class UnreadNotificationsCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        batch = Batch.objects.create(number=1)
+        cls.studentgroups = [
+            StudentGroup.objects.create(
+                title=f'Group {index}', department='CSE', batch=batch)
+            for index in range(2)
+        ]
+        cls.student = User.objects.create(
+            username='C000001',
+            is_student=True,
+            studentgroup=cls.studentgroups[0],
+        )
+
+    def setUp(self):
+        Notification.objects.deliver([
+            (studentgroup.pk, 'Comment', [self.student.pk])
+            for studentgroup in self.studentgroups
+        ] + [(self.studentgroups[0].pk, 'Logbook', [self.student.pk])])
+
+    def get_unread_count(self):
+        return User.objects.get(pk=self.student.pk).unread_notifications_count
+
+    def test_profile_save_keeps_concurrent_count(self):
+        student = User.objects.get(pk=self.student.pk)
+        self.assertEqual(student.unread_notifications_count, 3)
+        Notification.objects.deliver([
+            (self.studentgroups[0].pk, 'Document', [self.student.pk])])
+        student.full_name = 'Student'
+        student.save()
+        self.assertEqual(self.get_unread_count(), 4)
+
+    def test_deleting_empty_group_updates_count(self):
+        self.assertEqual(self.get_unread_count(), 3)
+        self.student.studentgroup = self.studentgroups[1]
+        self.student.save()
+        self.assertFalse(
+            StudentGroup.objects.filter(pk=self.studentgroups[0].pk).exists())
+        self.assertEqual(self.get_unread_count(), 1)
+
+    def test_deleting_notifications_updates_count(self):
+        Notification.objects.filter(content='Logbook').update(is_viewed=True)
+        Notification.objects.reconcile_unread_counts()
+        self.assertEqual(self.get_unread_count(), 2)
+        Notification.objects.filter(
+            studentgroup=self.studentgroups[0]).delete()
+        self.assertEqual(self.get_unread_count(), 1)
+        Notification.objects.get().delete()
+        self.assertEqual(self.get_unread_count(), 0)
+
+
+@override_settings(NOTIFICATIONS_USE_OUTBOX=True)
+class NotificationOutboxTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.studentgroup = StudentGroup.objects.create(
+            title='Group', department='CSE', batch=Batch.objects.create(number=1))
+        cls.student = User.objects.create(
+            username='O000001',
+            is_student=True,
+            studentgroup=cls.studentgroup,
+        )
+
+    def process_outbox(self):
+        call_command(
+            'process_notification_outbox',
+            once=True,
+            backoff=60,
+            max_attempts=2,
+            stdout=StringIO(),
+            stderr=StringIO(),
+        )
+
+    def test_recipients_are_stored_when_queued(self):
+        Notification.objects.notify(self.studentgroup, 'Comment')
+        User.objects.create(
+            username='O000002',
+            is_student=True,
+            studentgroup=self.studentgroup,
+        )
+        self.assertEqual(
+            NotificationOutbox.objects.get().recipient_ids, [self.student.pk])
+        self.process_outbox()
+        self.assertEqual(
+            list(Notification.objects.values_list('user', flat=True)),
+            [self.student.pk])
+
+    def test_failed_entry_is_retried_after_backoff(self):
+        Notification.objects.notify(self.studentgroup, 'Comment')
+        with mock.patch.object(
+                Notification.objects, 'deliver',
+                side_effect=RuntimeError('unavailable')):
+            self.process_outbox()
+        entry = NotificationOutbox.objects.get()
+        self.assertEqual(entry.attempts, 1)
+        self.assertIn('unavailable', entry.last_error)
+        self.assertGreater(
+            entry.available_at, timezone.now() + timedelta(seconds=50))
+
+        self.process_outbox()
+        self.assertFalse(Notification.objects.exists())
+
+        NotificationOutbox.objects.update(available_at=timezone.now())
+        self.process_outbox()
+        self.assertFalse(NotificationOutbox.objects.exists())
+        self.assertEqual(Notification.objects.get().user, self.student)
+
+    def test_entry_is_left_after_max_attempts(self):
+        Notification.objects.notify(self.studentgroup, 'Comment')
+        NotificationOutbox.objects.update(attempts=2)
+        self.process_outbox()
+        self.assertTrue(NotificationOutbox.objects.exists())
+        self.assertFalse(Notification.objects.exists())
+
+
+class BatchRecomputeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.batch = Batch.objects.create(number=1)
+        teacher = User.objects.create(username='teacher', is_teacher=True)
+        studentgroup = StudentGroup.objects.create(
+            title='Group',
+            department='CSE',
+            batch=cls.batch,
+            teacher=teacher,
+            approved=True,
+        )
+        cls.student = User.objects.create(
+            username='R000001',
+            is_student=True,
+            studentgroup=studentgroup,
+        )
+        Mark.objects.create(
+            mark=80,
+            studentgroup=studentgroup,
+            graded_by=teacher,
+            student=cls.student,
+            result=cls.student.result,
+        )
+        ResultRanking.objects.rebuild(cls.batch)
+
+    def save_batch(self, **values):
+        batch = Batch.objects.get(pk=self.batch.pk)
+        for field_name, value in values.items():
+            setattr(batch, field_name, value)
+        with mock.patch.object(transaction, 'on_commit') as on_commit:
+            batch.save()
+        for call in on_commit.call_args_list:
+            call.args[0]()
+        return Batch.objects.get(pk=self.batch.pk), on_commit
+
+    def get_total_marks(self):
+        return Result.objects.get(student=self.student).total_marks
+
+    def test_percentage_change_recomputes_results(self):
+        self.assertEqual(self.get_total_marks(), 40)
+        self.assertFalse(Batch.objects.get(pk=self.batch.pk).rankings_stale)
+        batch, _ = self.save_batch(
+            supervisor_mark_percentage=60, internal_mark_percentage=20)
+        self.assertEqual(self.get_total_marks(), 48)
+        self.assertTrue(batch.rankings_stale)
+
+    def test_other_changes_do_not_recompute(self):
+        batch, on_commit = self.save_batch(max_groups_num=10)
+        on_commit.assert_not_called()
+        self.assertFalse(batch.rankings_stale)
+
+
+class ArchiveNotificationsTests(TestCase):
+    def setUp(self):
+        studentgroup = StudentGroup.objects.create(
+            title='Group', department='CSE', batch=Batch.objects.create(number=1))
+        student = User.objects.create(
+            username='A000001', is_student=True, studentgroup=studentgroup)
+        Notification.objects.deliver([
+            (studentgroup.pk, 'Comment', [student.pk])])
+        Notification.objects.update(
+            is_viewed=True, created_at=timezone.now() - timedelta(days=100))
+
+    def archive(self, *args):
+        stdout = StringIO()
+        call_command('archive_notifications', *args, stdout=stdout)
+        return stdout.getvalue().splitlines()
+
+    def test_archive_messages(self):
+        lines = self.archive()
+        self.assertTrue(lines[0].startswith('Moved 1 notifications in '))
+        self.assertTrue(lines[-1].startswith('Archived 1 notifications in '))
+        self.assertEqual(ArchivedNotification.objects.count(), 1)
+
+    def test_delete_messages(self):
+        lines = self.archive('--delete')
+        self.assertTrue(lines[0].startswith('Deleted 1 notifications in '))
+        self.assertTrue(lines[-1].startswith('Deleted 1 notifications in '))
+        self.assertFalse(ArchivedNotification.objects.exists())
+        self.assertFalse(Notification.objects.exists())
+
+
+class BulkGradingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.batch = Batch.objects.create(number=1)
+        cls.teacher = User.objects.create(username='teacher', is_teacher=True)
+
+    def create_group(self, students_count):
+        studentgroup = StudentGroup.objects.create(
+            title='Group',
+            department='CSE',
+            batch=self.batch,
+            teacher=self.teacher,
+            approved=True,
+        )
+        for index in range(students_count):
+            User.objects.create(
+                username=f'G{studentgroup.id}{index:05}',
+                is_student=True,
+                studentgroup=studentgroup,
+            )
+        return studentgroup
+
+    def get_formset(self, studentgroup, mark):
+        students = list(studentgroup.students.order_by('username'))
+        MarkFormSet = formset_factory(
+            MarkForm,
+            min_num=len(students),
+            max_num=len(students),
+            formset=BaseMarkFormSet,
+        )
+        data = {
+            'form-TOTAL_FORMS': len(students),
+            'form-INITIAL_FORMS': 0,
+        }
+        for index, student in enumerate(students):
+            data[f'form-{index}-student_choice'] = student.id
+            data[f'form-{index}-mark'] = mark
+        formset = MarkFormSet(data, form_kwargs={
+            'user': self.teacher,
+            'studentgroup': studentgroup,
+        })
+        self.assertTrue(formset.is_valid(), formset.errors)
+        return formset
+
+    def count_save_queries(self, formset):
+        with CaptureQueriesContext(connection) as context:
+            formset.save()
+        return len(context)
+
+    def test_save_query_count_is_constant(self):
+        small = self.get_formset(self.create_group(1), 60)
+        large = self.get_formset(self.create_group(5), 60)
+        self.assertEqual(
+            self.count_save_queries(small), self.count_save_queries(large))
+
+    def count_page_queries(self, studentgroup):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse(
+                'thesis:grading_students', args=(studentgroup.md5hash,)))
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def test_grading_page_query_count_is_constant(self):
+        self.client.force_login(self.teacher)
+        self.assertEqual(
+            self.count_page_queries(self.create_group(1)),
+            self.count_page_queries(self.create_group(5)),
+        )
+
+    def test_regrading_updates_marks_and_results(self):
+        studentgroup = self.create_group(2)
+        self.get_formset(studentgroup, 60).save()
+        self.get_formset(studentgroup, 80).save()
+        self.assertEqual(
+            list(Mark.objects.filter(
+                studentgroup=studentgroup).values_list('mark', flat=True)),
+            [80, 80],
+        )
+        percentage = self.batch.supervisor_mark_percentage
+        for result in Result.objects.filter(student__studentgroup=studentgroup):
+            self.assertEqual(result.total_marks, 80 * percentage / 100)
+
+    def test_save_bumps_results_version_once(self):
+        formset = self.get_formset(self.create_group(2), 60)
+        formset.save()
+        self.batch.refresh_from_db()
+        self.assertEqual(self.batch.results_version, 1)
+        formset.save()
+        self.batch.refresh_from_db()
+        self.assertEqual(self.batch.results_version, 1)
+
+
+class RosterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.batch = Batch.objects.create(number=1)
+        cls.studentgroup = StudentGroup.objects.create(
+            title='Listed Group',
+            department='CSE',
+            batch=cls.batch,
+            student_list='C000001, C000002',
+        )
+        cls.teacher = User.objects.create(username='teacher', is_teacher=True)
+        cls.field = ResearchField.objects.create(name='Networking')
+
+    def get_roster(self, studentgroup):
+        return sorted(studentgroup.roster.values_list('username', flat=True))
+
+    def test_roster_follows_student_list(self):
+        self.assertEqual(
+            self.get_roster(self.studentgroup), ['C000001', 'C000002'])
+        self.studentgroup.student_list = 'C000002,C000003'
+        self.studentgroup.save()
+        self.assertEqual(
+            self.get_roster(self.studentgroup), ['C000002', 'C000003'])
+
+    def test_listed_student_joins_group(self):
+        student = User.objects.create(username='C000001', is_student=True)
+        self.assertEqual(student.studentgroup, self.studentgroup)
+        student = User.objects.create(username='C00000', is_student=True)
+        self.assertIsNone(student.studentgroup)
+
+    def test_student_list_validation(self):
+        data = {
+            'title': 'New Group',
+            'batch': self.batch.pk,
+            'field': self.field.pk,
+            'student_list': 'C000002,C000004',
+            'first_choice': self.teacher.pk,
+        }
+        form = StudentGroupForm(self.teacher, data=data)
+        self.assertFalse(form.is_valid())
+        self.assertEqual(
+            form.errors['student_list'], ['C000002 already has a group.'])
+
+        form = StudentGroupForm(
+            self.teacher, data=data, instance=self.studentgroup)
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        self.assertEqual(
+            self.get_roster(self.studentgroup), ['C000002', 'C000004'])
+        self.assertFalse(RosterEntry.objects.filter(username='C000001').exists())
@@ -75,6 +75,10 @@ urlpatterns = [
         'group/notifications/',
         views.NotificationListView.as_view(),
         name='user_notifications'),
+    path(
+        'group/notifications/mark-read/',
+        views.NotificationMarkReadView.as_view(),
+        name='notifications_mark_read'),
     path(
         'group/comment/create/',
         views.CommentCreateView.as_view(),
@@ -96,6 +100,10 @@ urlpatterns = [
         'group/<group_code>/toggle-document/<document_id>/',
         views.DocumentAcceptedToggleView.as_view(),
         name='group_document_toggle_view'),
+    path(
+        'group/<group_code>/notifications/mark-read/',
+        views.NotificationMarkReadView.as_view(),
+        name='group_notifications_mark_read'),
     path(
         'group/<group_code>/comment/create/',
         views.CommentCreateView.as_view(),
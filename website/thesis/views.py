@@ -11,9 +11,10 @@ from django.views.generic import (
     TemplateView,
     UpdateView,
     RedirectView,
+    View,
 )
 from django.conf import settings
-from django.db.models import Count
+from django.db.models import Count, Prefetch
 from django.core.serializers.json import DjangoJSONEncoder
 from django.contrib.auth.decorators import login_required
 
@@ -74,7 +75,7 @@ class GroupJoinView(LoginRequiredMixin, UserIsStudentMixin, FormView):
     def form_valid(self, form):
         md5hash = form.cleaned_data.get('md5hash')
         studentgroup = get_object_or_404(StudentGroup, md5hash=md5hash)
-        if studentgroup.status != 'Pending':
+        if studentgroup.stage != StudentGroup.Stage.PENDING:
             messages.error(
                 self.request,
                 "The Group has already been approved by admin. You can not join this group.",
@@ -82,8 +83,7 @@ class GroupJoinView(LoginRequiredMixin, UserIsStudentMixin, FormView):
             )
             return HttpResponseRedirect('/group/join/')
         batch = studentgroup.batch
-        students_count = studentgroup.students.all().count()
-        if students_count >= batch.max_students_per_group:
+        if studentgroup.students_count >= batch.max_students_per_group:
             messages.error(
                 self.request,
                 'The Group has already reached maximum capacity',
@@ -129,14 +129,12 @@ class DocumentListView(
         return context
 
     def get(self, request, *args, **kwargs):
-        notifications = Notification.objects.filter(
+        marked = Notification.objects.mark_read(
             user=request.user,
             studentgroup=self.studentgroup,
-            is_viewed=False,
         )
-        for notification in notifications:
-            notification.is_viewed = True
-        Notification.objects.bulk_update(notifications, ['is_viewed'])
+        request.user.unread_notifications_count = max(
+            request.user.unread_notifications_count - marked, 0)
         response = super().get(request, *args, **kwargs)
         return response
 
@@ -259,6 +257,7 @@ class BaseGroupListView(LoginRequiredMixin, UserIsTeacherMixin, ListView):
     template_name = "thesis/group_list.html"
     http_method_names = ['get']
     context_object_name = 'groups'
+    paginate_by = 20
 
     def get_context_data(self, *args, object_list=None, **kwargs):
         context_data = super().get_context_data(
@@ -267,15 +266,45 @@ class BaseGroupListView(LoginRequiredMixin, UserIsTeacherMixin, ListView):
         context_data['batches'] = Batch.objects.all()
         context_data['batch_number'] = int(
             batch_number) if batch_number else ''
+        context_data['stages'] = StudentGroup.Stage.choices
+        context_data['stage'] = self.get_stage()
+        context_data['ordering'] = self.get_stage_ordering()
+        querystring = self.request.GET.copy()
+        querystring.pop('page', None)
+        context_data['querystring'] = querystring.urlencode()
         return context_data
 
+    def get_stage(self):
+        stage = self.request.GET.get('stage', '')
+        if stage.isdigit() and int(stage) in StudentGroup.Stage.values:
+            return int(stage)
+        return ''
+
+    def get_stage_ordering(self):
+        ordering = self.request.GET.get('ordering', '')
+        if ordering in ('stage', '-stage'):
+            return ordering
+        return ''
+
     def get_studentgroups(self, studentgroup_related_name):
         user = self.request.user
+        students = User.objects.only(
+            'id', 'username', 'full_name', 'studentgroup',
+        ).order_by('username')
         queryset = getattr(user, studentgroup_related_name).filter(
-            approved=True).order_by('id')
+            approved=True,
+        ).select_related('batch').prefetch_related(
+            Prefetch('students', queryset=students),
+        ).order_by('id')
         batch_number = self.kwargs.get('batch_number', '')
         if batch_number:
-            return queryset.filter(batch__number=batch_number)
+            queryset = queryset.filter(batch__number=batch_number)
+        stage = self.get_stage()
+        if stage != '':
+            queryset = queryset.filter(stage=stage)
+        ordering = self.get_stage_ordering()
+        if ordering:
+            queryset = queryset.order_by(ordering, 'id')
         return queryset
 
 
@@ -303,6 +332,25 @@ class NotificationListView(LoginRequiredMixin, ListView):
         return Notification.objects.filter(user=self.request.user, is_viewed=False).order_by('-created_at')
 
 
+class NotificationMarkReadView(LoginRequiredMixin, View):
+    http_method_names = ['post']
+
+    def post(self, request, *args, **kwargs):
+        studentgroup = None
+        group_code = self.kwargs.get('group_code')
+        if group_code:
+            studentgroup = get_object_or_404(StudentGroup, md5hash=group_code)
+        marked = Notification.objects.mark_read(
+            user=request.user,
+            studentgroup=studentgroup,
+        )
+        return JsonResponse({
+            'marked_read': marked,
+            'unread_notifications_count': max(
+                request.user.unread_notifications_count - marked, 0),
+        })
+
+
 class GroupUpdateView(
         LoginRequiredMixin, UserIsStudentMixin, UserHasGroupAccessMixin,
         UpdateView):
@@ -423,8 +471,9 @@ def get_teachers_list_by_field_json(request, field_id):
 def grade_students(request, group_code):
     studentgroup = get_object_or_404(StudentGroup, md5hash=group_code)
     user = request.user
-    students = studentgroup.students.all().order_by('username')
-    students_count = students.count()
+    students = list(
+        studentgroup.students.select_related('result').order_by('username'))
+    students_count = len(students)
     MarkFormSet = formset_factory(
         MarkForm,
         extra=students_count,
@@ -439,6 +488,7 @@ def grade_students(request, group_code):
             'user': user,
             'studentgroup': studentgroup,
         },
+        "students": students,
         "initial": [{"student_choice": student.id} for student in students],
     }
     if request.method == 'POST':